@@ -0,0 +1,277 @@
+"""
+Time and measure the peak memory of the main LifeCycle operations on seeded synthetic lifecycles of several sizes.
+
+Usage:
+
+    python benchmarks/run_benchmarks.py --scales small medium --output results.json
+    python benchmarks/run_benchmarks.py --generator planted --scales large --output planted.json
+    python benchmarks/run_benchmarks.py --backends csr --benchmarks events_all all_flows
+    python benchmarks/run_benchmarks.py --compare baseline.json results.json
+
+Each benchmark runs on a fresh LifeCycle of each storage backend (built outside of the measurements), so cached flow
+matrices and interned elements never leak from one run to another. Times are the best of --repeat runs; peak memory
+is measured with tracemalloc in a separate run, since tracing slows the code down.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import lifecycles as lcs
+from lifecycles.generators import (
+    planted_event_lifecycle,
+    planted_event_partitions,
+    random_lifecycle,
+    random_partitions,
+)
+
+SCALES = {
+    "small": dict(n_elements=1_000, n_groups=10, n_steps=10),
+    "medium": dict(n_elements=20_000, n_groups=50, n_steps=20),
+    "large": dict(n_elements=200_000, n_groups=200, n_steps=50),
+}
+
+
+def _partitions(generator: str, params: dict) -> list:
+    if generator == "planted":
+        return planted_event_partitions(**params)[0]
+    return random_partitions(**params)
+
+
+def _lifecycle(
+    generator: str, params: dict, backend: str, n_categories: int = 0
+) -> lcs.LifeCycle:
+    # a random attribute, named "attr", for every element at every time step if n_categories > 0
+    if generator == "planted":
+        return planted_event_lifecycle(
+            **params, n_categories=n_categories, backend=backend
+        )[0]
+    return random_lifecycle(**params, n_categories=n_categories, backend=backend)
+
+
+def _json_round_trip(lc: lcs.LifeCycle) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "lc.json")
+        lc.write_json(path)
+        lcs.LifeCycle().read_json(path)
+
+
+def _binary_round_trip(lc: lcs.LifeCycle) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        lc.write_binary(tmp)
+        loaded = lcs.LifeCycle()
+        loaded.read_binary(tmp)
+        # groups are read lazily: decode all of them, as read_json does
+        for _ in loaded.group_iterator():
+            pass
+
+
+# name -> (setup(generator, params, backend) returning the arguments, function)
+BENCHMARKS = {
+    "add_partitions_from": (
+        lambda g, p, b: (lcs.LifeCycle(int, backend=b), _partitions(g, p)),
+        lambda lc, partitions: lc.add_partitions_from(partitions),
+    ),
+    "all_flows": (
+        lambda g, p, b: (_lifecycle(g, p, b),),
+        lambda lc: lc.all_flows("+"),
+    ),
+    "events_all": (
+        lambda g, p, b: (_lifecycle(g, p, b),),
+        lambda lc: lcs.events_all(lc),
+    ),
+    "analyze_all_flows_attr": (
+        lambda g, p, b: (_lifecycle(g, p, b, 5),),
+        lambda lc: lcs.analyze_all_flows(lc, "+", attr="attr"),
+    ),
+    "events_asur": (
+        lambda g, p, b: (_lifecycle(g, p, b),),
+        lambda lc: lcs.events_asur(lc, 0.5),
+    ),
+    "event_graph_greene": (
+        lambda g, p, b: (_lifecycle(g, p, b),),
+        lambda lc: lcs.event_graph_greene(lc, 0.1),
+    ),
+    "validate_all_flows_analytic": (
+        lambda g, p, b: (_lifecycle(g, p, b),),
+        lambda lc: lcs.validate_all_flows(lc, "+", method="analytic"),
+    ),
+    "validate_all_flows_montecarlo": (
+        lambda g, p, b: (_lifecycle(g, p, b),),
+        lambda lc: lcs.validate_all_flows(
+            lc, "+", method="montecarlo", iterations=100, seed=0
+        ),
+    ),
+    "get_all_element_memberships": (
+        lambda g, p, b: (_lifecycle(g, p, b),),
+        lambda lc: lc.get_all_element_memberships(),
+    ),
+    "json_round_trip": (
+        lambda g, p, b: (_lifecycle(g, p, b),),
+        _json_round_trip,
+    ),
+    "binary_round_trip": (
+        lambda g, p, b: (_lifecycle(g, p, b),),
+        _binary_round_trip,
+    ),
+}
+
+
+def measure(setup, func, workload: tuple, repeat: int) -> dict:
+    """
+    time a benchmark (best of repeat runs) and measure its peak memory. workload holds the arguments of setup
+    """
+    times = []
+    # e.g., read_json reports the loaded file
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            args = setup(*workload)
+            start = time.perf_counter()
+            func(*args)
+            times.append(time.perf_counter() - start)
+
+        args = setup(*workload)
+        tracemalloc.start()
+        try:
+            func(*args)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return {"time": min(times), "times": times, "peak_memory": peak}
+
+
+def run(
+    scales: list,
+    benchmarks: list,
+    backends: list,
+    repeat: int,
+    generator: str,
+    churn: float,
+    seed: int,
+) -> dict:
+    # the validation stack is imported lazily: load it outside of the measurements
+    import lifecycles.validation
+
+    results = []
+    for scale in scales:
+        params = dict(SCALES[scale], seed=seed)
+        if generator == "random":
+            params["churn"] = churn
+        for backend in backends:
+            for name in benchmarks:
+                setup, func = BENCHMARKS[name]
+                res = measure(setup, func, (generator, params, backend), repeat)
+                results.append(
+                    dict(
+                        benchmark=name,
+                        scale=scale,
+                        backend=backend,
+                        params=params,
+                        **res,
+                    )
+                )
+                print(
+                    f"{scale:>8} {backend:>4} {name:<32} {res['time']:10.4f} s "
+                    f"{res['peak_memory'] / 2**20:10.1f} MiB",
+                    file=sys.stderr,
+                )
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "repeat": repeat,
+            "generator": generator,
+        },
+        "results": results,
+    }
+
+
+def compare(baseline: dict, current: dict) -> None:
+    """
+    print the time and memory ratios (current / baseline) of the benchmarks found in both runs
+    """
+
+    # results saved before the backend was recorded are those of the default "sets" backend
+    def key(res: dict) -> tuple:
+        return res["benchmark"], res["scale"], res.get("backend", "sets")
+
+    reference = {key(r): r for r in baseline["results"]}
+    for res in current["results"]:
+        if key(res) not in reference:
+            continue
+        time_ratio = res["time"] / max(reference[key(res)]["time"], 1e-12)
+        memory_ratio = res["peak_memory"] / max(reference[key(res)]["peak_memory"], 1)
+        name, scale, backend = key(res)
+        print(
+            f"{scale:>8} {backend:>4} {name:<32} time x{time_ratio:6.2f}  memory x{memory_ratio:6.2f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--scales", nargs="+", default=["small", "medium"], choices=list(SCALES)
+    )
+    parser.add_argument(
+        "--benchmarks", nargs="+", default=list(BENCHMARKS), choices=list(BENCHMARKS)
+    )
+    parser.add_argument(
+        "--backends", nargs="+", default=["sets", "csr"], choices=["sets", "csr"]
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--generator",
+        default="random",
+        choices=["random", "planted"],
+        help="random partitions with churn, or partitions with planted events",
+    )
+    parser.add_argument("--churn", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--output", default=None, help="the JSON file to write the results to"
+    )
+    parser.add_argument(
+        "--compare",
+        nargs=2,
+        metavar=("BASELINE", "CURRENT"),
+        help="compare two JSON result files",
+    )
+    args = parser.parse_args()
+
+    if args.compare is not None:
+        with open(args.compare[0]) as f, open(args.compare[1]) as g:
+            compare(json.load(f), json.load(g))
+        return
+
+    results = run(
+        args.scales,
+        args.benchmarks,
+        args.backends,
+        args.repeat,
+        args.generator,
+        args.churn,
+        args.seed,
+    )
+    if args.output is None:
+        print(json.dumps(results, indent=2))
+    else:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
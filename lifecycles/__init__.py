@@ -1,7 +1,59 @@
+from importlib import import_module as _import_module
+
+from lifecycles.algorithms import classic_match as _classic_match
+from lifecycles.algorithms import event_analysis as _event_analysis
+from lifecycles.algorithms import measures as _measures
 from lifecycles.algorithms.classic_match import *
 from lifecycles.algorithms.event_analysis import *
 from lifecycles.algorithms.measures import *
+from lifecycles.classes import classes as _classes
 from lifecycles.classes.classes import *
+from lifecycles.generators import generators as _generators
+from lifecycles.generators.generators import *
+from lifecycles.utils import instrumentation as _instrumentation
+from lifecycles.utils import utils as _utils
+from lifecycles.utils.instrumentation import *
 from lifecycles.utils.utils import *
-from lifecycles.validation.validation import *
-from lifecycles.viz.viz import *
+
+# the validation and plotting stacks (scipy.stats, matplotlib, plotly, pandas) are imported on first use
+_lazy_names = {
+    "validate_flow": "lifecycles.validation.validation",
+    "validate_all_flows": "lifecycles.validation.validation",
+    "NullModelCache": "lifecycles.validation.validation",
+    "plot_flow": "lifecycles.viz.viz",
+    "plot_event_radar": "lifecycles.viz.viz",
+    "plot_event_radars": "lifecycles.viz.viz",
+    "typicality_distribution": "lifecycles.viz.viz",
+}
+_lazy_modules = ["validation", "viz"]
+
+# the public names of the submodules (measures also exports a private helper, which is not re-exported)
+__all__ = [
+    name
+    for module in [
+        _classic_match,
+        _event_analysis,
+        _measures,
+        _classes,
+        _generators,
+        _instrumentation,
+        _utils,
+    ]
+    for name in module.__all__
+    if not name.startswith("_")
+] + list(_lazy_names)
+
+
+def __getattr__(name: str):
+    if name in _lazy_names:
+        value = getattr(_import_module(_lazy_names[name]), name)
+    elif name in _lazy_modules:
+        value = _import_module(f"{__name__}.{name}")
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value  # later accesses skip __getattr__
+    return value
+
+
+def __dir__() -> list:
+    return sorted(set(globals()) | set(_lazy_names) | set(_lazy_modules))
@@ -1,6 +1,17 @@
-from itertools import combinations
+from collections import Counter, defaultdict
+from itertools import chain, combinations
 
-__all__ = ["events_asur", "event_graph_greene"]
+import numpy as np
+
+from lifecycles.utils.instrumentation import instrumented
+
+__all__ = [
+    "events_asur",
+    "event_graph_greene",
+    "events_asur_sweep",
+    "event_graph_greene_sweep",
+    "GreeneTracker",
+]
 
 
 def _asur_merge_score(t: set, R: list) -> float:
@@ -32,135 +43,176 @@ def _greene_merge_score(t: set, R: set) -> float:
     return len(t.intersection(R)) / len(t.union(R))
 
 
-def _find_asur_merge_events(lc: object, th: float) -> list:
+def _greene_step_scores(flow_matrix) -> tuple:
     """
-    Find merge events in a lifecycle according to Asur et al.
+    Compute the greene merge score (Jaccard index) of all the pairs of overlapping groups of a flow matrix, as
+    |A & B| / (|A| + |B| - |A & B|) from the overlap counts and the group sizes.
 
-    :param lc: the lifecycle object
+    :param flow_matrix: the FlowMatrix between two partitions
+    :return: a tuple (source rows, reference columns, scores) of the overlapping pairs, ordered by row then column
+    """
+    counts = flow_matrix.counts
+    rows = np.repeat(np.arange(counts.shape[0]), np.diff(counts.indptr))
+    cols = counts.indices
+    overlaps = counts.data.astype(np.int64)
+    unions = (
+        flow_matrix.source.sizes()[rows].astype(np.int64)
+        + flow_matrix.reference.sizes()[cols]
+        - overlaps
+    )
+    return rows, cols, overlaps / unions
+
+
+def _asur_pair_scores(counts, sizes, size: int, th: float) -> tuple:
+    """
+    Compute the asur merge scores of the pairs of branches of a group from overlap counts alone.
+    When the reference groups are disjoint, the union of two of them has size s1 + s2 and shares c1 + c2 elements
+    with the target, so the score is (c1 + c2) / max(s1 + s2, size). Since the score is at most (c1 + c2) / size,
+    each branch is only paired with the branches whose overlap can reach the threshold.
+
+    :param counts: the overlaps between the target and its branches
+    :param sizes: the sizes of the branches (reference groups)
+    :param size: the size of the target
     :param th: cluster integrity threshold
-    :return: dictionary of merge events
+    :return: a tuple (first branches, second branches, scores) of the pairs scoring above th, in combinations order
     """
-    events = []
-    for t in lc.temporal_ids()[1:]:  # start from the second time step
-        for set_name in lc.get_partition_at(t):
-            target = lc.get_group(set_name)
-            flow = lc.group_flow(set_name, "-")
-            r_names = list(flow.keys())  # names of the reference sets
-            # compute for all pair of reference sets (combinations)
-            for r1, r2 in combinations(r_names, 2):
-                merge_score = _asur_merge_score(
-                    target, [lc.get_group(r1), lc.get_group(r2)]
-                )
-
-                if merge_score > th:
-                    events.append(
-                        {
-                            "src": set_name,
-                            "type": "merge",
-                            "score": merge_score,
-                            "ref_sets": [r1, r2],  # names of the reference sets
-                        }
-                    )
-
-    return events
-
-
-def _find_asur_split_events(lc: object, th: float) -> list:
+    counts = np.asarray(counts, dtype=np.int64)
+    sizes = np.asarray(sizes, dtype=np.int64)
+    order = np.argsort(-counts, kind="stable")
+    # number of branches whose overlap reaches the bound of each branch (with an integer slack against rounding)
+    bounds = th * size - counts - 1
+    reach = np.searchsorted(-counts[order], -bounds, side="right")
+
+    firsts = np.repeat(np.arange(len(counts)), reach)
+    offsets = np.arange(len(firsts)) - np.repeat(np.cumsum(reach) - reach, reach)
+    seconds = order[offsets]
+    # the bound is symmetric: each pair is reached from both sides
+    keep = firsts < seconds
+    firsts, seconds = firsts[keep], seconds[keep]
+
+    scores = (counts[firsts] + counts[seconds]) / np.maximum(
+        sizes[firsts] + sizes[seconds], size
+    )
+    keep = scores > th
+    firsts, seconds, scores = firsts[keep], seconds[keep], scores[keep]
+    pairs = np.lexsort((seconds, firsts))
+    return firsts[pairs], seconds[pairs], scores[pairs]
+
+
+def _asur_pair_events(lc: object, flow_matrix, th: float, event_type: str) -> list:
     """
-    Find merge events in a lifecycle according to Asur et al.
+    Find the merge (backward flow) or split (forward flow) events of the source groups of a flow matrix according to
+    Asur et al., by scoring every pair of branches of each source group.
+    Pairs are scored from the overlap counts when the reference groups are disjoint, and from the sets otherwise.
 
     :param lc: the lifecycle object
+    :param flow_matrix: the FlowMatrix between two adjacent partitions
     :param th: cluster integrity threshold
-    :return: dictionary of merge events
+    :param event_type: the type of the events, either "merge" or "split"
+    :return: list of events
     """
     events = []
-    for t in lc.temporal_ids()[0:]:  # start from the second time step
-        for set_name in lc.get_partition_at(t):
+    source_names = flow_matrix.source.names()
+    reference_names = flow_matrix.reference.names()
+    source_sizes = flow_matrix.source.sizes().tolist()
+    reference_sizes = flow_matrix.reference.sizes()
+    disjoint = flow_matrix.reference.is_disjoint()
+    for row, set_name in enumerate(source_names):
+        cols, counts = flow_matrix.row(row)
+        if len(cols) < 2:
+            continue
+        r_names = [reference_names[col] for col in cols.tolist()]
+
+        if disjoint:
+            firsts, seconds, scores = _asur_pair_scores(
+                counts, reference_sizes[cols], source_sizes[row], th
+            )
+            pairs = zip(firsts.tolist(), seconds.tolist(), scores.tolist())
+            scored = [(r_names[i], r_names[j], score) for i, j, score in pairs]
+        else:
             target = lc.get_group(set_name)
-            flow = lc.group_flow(set_name, "+")
-            r_names = list(flow.keys())  # names of the reference sets
             # compute for all pair of reference sets (combinations)
-            for r1, r2 in combinations(r_names, 2):
-                merge_score = _asur_merge_score(
-                    target, [lc.get_group(r1), lc.get_group(r2)]
+            scored = [
+                (
+                    r1,
+                    r2,
+                    _asur_merge_score(target, [lc.get_group(r1), lc.get_group(r2)]),
+                )
+                for r1, r2 in combinations(r_names, 2)
+            ]
+
+        for r1, r2, merge_score in scored:
+            if merge_score > th:
+                events.append(
+                    {
+                        "src": set_name,
+                        "type": event_type,
+                        "score": merge_score,
+                        "ref_sets": [r1, r2],  # names of the reference sets
+                    }
                 )
 
-                if merge_score > th:
-                    events.append(
-                        {
-                            "src": set_name,
-                            "type": "split",
-                            "score": merge_score,
-                            "ref_sets": [r1, r2],  # names of the reference sets
-                        }
-                    )
-
-    return events
-
-
-def _find_asur_birth_events(lc: object) -> list:
-    """
-    Find continue events in a lifecycle according to Asur et al.
-
-    :param lc: the lifecycle object
-    :return: dictionary of continue events
-    """
-    events = []
-    for t in lc.temporal_ids()[1:]:  # start from the second time step
-        for set_name in lc.get_partition_at(t):
-            flow = lc.group_flow(set_name, "-")
-            r_names = list(flow.keys())  # names of the reference sets
-            if len(r_names) == 0:
-                events.append({"src": set_name, "type": "birth"})
-    return events
-
-
-def _find_asur_death_events(lc: object) -> list:
-    """
-    Find continue events in a lifecycle according to Asur et al.
-
-    :param lc: the lifecycle object
-    :return: dictionary of continue events
-    """
-    events = []
-    for t in lc.temporal_ids()[0:-1]:  # start from the second time step
-        for set_name in lc.get_partition_at(t):
-            flow = lc.group_flow(set_name, "+")
-            r_names = list(flow.keys())  # names of the reference sets
-            if len(r_names) == 0:
-                events.append({"src": set_name, "type": "death"})
     return events
 
 
-def _find_asur_continue_events(lc: object) -> list:
+@instrumented(
+    "_asur_step_events", lambda res, *a, **k: sum(len(v) for v in res.values())
+)
+def _asur_step_events(lc: object, tid: int, th: float, first: bool, last: bool) -> dict:
     """
-    Find continue events in a lifecycle according to Asur et al.
+    Find all the events of the groups observed at a given time step according to Asur et al.
+    Both flows of the time step are read from the flow matrices cached by the lifecycle, so the overlaps between two
+    adjacent partitions are computed once and shared by all the event types.
 
     :param lc: the lifecycle object
-    :return: dictionary of continue events
+    :param tid: the temporal id of the groups
+    :param th: cluster integrity threshold
+    :param first: whether tid is the first temporal id (no merge nor birth events)
+    :param last: whether tid is the last temporal id (no split, death, nor continue events)
+    :return: dictionary of events of the form {event_type: [event1, event2, ...]}
     """
-    events = []
-    for t in lc.temporal_ids()[0:-1]:  # start from the second time step
-        for set_name in lc.get_partition_at(t):
-            flow = lc.group_flow(set_name, "+")
-            r_names = list(flow.keys())  # names of the reference sets
-            for name in r_names:
-                if lc.get_group(name) == lc.get_group(set_name):
-                    events.append(
-                        {
-                            "src": set_name,
-                            "type": "continue",
-                            "ref_set": name,
-                        }
-                    )
-                    continue
+    events = {"merge": [], "split": [], "birth": [], "death": [], "continue": []}
+    if not first:
+        backward = lc.get_flow_matrix(tid, "-")
+        events["merge"] = _asur_pair_events(lc, backward, th, "merge")
+        n_branches = np.diff(backward.counts.indptr)
+        for row in np.flatnonzero(n_branches == 0).tolist():
+            events["birth"].append(
+                {"src": backward.source.names()[row], "type": "birth"}
+            )
+
+    if not last:
+        forward = lc.get_flow_matrix(tid, "+")
+        events["split"] = _asur_pair_events(lc, forward, th, "split")
+        source_names = forward.source.names()
+        reference_names = forward.reference.names()
+        source_sizes = forward.source.sizes()
+        reference_sizes = forward.reference.sizes()
+        for row, set_name in enumerate(source_names):
+            cols, counts = forward.row(row)
+            if len(cols) == 0:
+                events["death"].append({"src": set_name, "type": "death"})
+                continue
+            # two groups are equal iff their overlap is as large as both of them
+            same = (counts == source_sizes[row]) & (counts == reference_sizes[cols])
+            for col in cols[same].tolist():
+                events["continue"].append(
+                    {
+                        "src": set_name,
+                        "type": "continue",
+                        "ref_set": reference_names[col],
+                    }
+                )
     return events
 
 
+@instrumented("events_asur", lambda res, *a, **k: sum(len(v) for v in res.values()))
 def events_asur(lc: object, th: float = 0.5) -> dict:
     """
     Compute the events in a lifecycle according to Asur et al.
     Return a dictionary of events of the form {event_type: [event1, event2, ...]}
+    All the event types are found in a single pass over the time steps, from the overlaps between each pair of
+    adjacent partitions, which are computed once.
 
     :param lc: the lifecycle object
     :param th: threshold for merge and split scores. Defaults to 0.5.
@@ -179,19 +231,43 @@ def events_asur(lc: object, th: float = 0.5) -> dict:
     >>> # add some data and then...
     >>> events = events_asur(lc, 0.5)
     """
-    return {
-        "merge": _find_asur_merge_events(lc, th),
-        "split": _find_asur_split_events(lc, th),
-        "birth": _find_asur_birth_events(lc),
-        "death": _find_asur_death_events(lc),
-        "continue": _find_asur_continue_events(lc),
-    }
+    events = {"merge": [], "split": [], "birth": [], "death": [], "continue": []}
+    tids = lc.temporal_ids()
+    for i, tid in enumerate(tids):
+        step_events = _asur_step_events(lc, tid, th, i == 0, i == len(tids) - 1)
+        for event_type, step in step_events.items():
+            events[event_type].extend(step)
+    return events
+
+
+def _greene_edges(lc: object, th: float) -> tuple:
+    """
+    Find the edges of the event graph according to Greene et al., i.e., the pairs of groups of adjacent partitions
+    whose Jaccard index exceeds th. Return the list of edges and the array of their scores.
+    """
+    events, scores = [], []
+    for t in lc.temporal_ids()[0:-1]:
+        flow_matrix = lc.get_flow_matrix(t, "+")
+        rows, cols, step_scores = _greene_step_scores(flow_matrix)
+        keep = step_scores > th
+        source_names = flow_matrix.source.names()
+        reference_names = flow_matrix.reference.names()
+        for row, col, merge_score in zip(
+            rows[keep].tolist(), cols[keep].tolist(), step_scores[keep].tolist()
+        ):
+            events.append((t, source_names[row], reference_names[col], merge_score))
+        scores.append(step_scores[keep])
+
+    return events, np.concatenate(scores) if scores else np.zeros(0)
 
 
+@instrumented("event_graph_greene", lambda res, *a, **k: len(res))
 def event_graph_greene(lc: object, th: float = 0.1) -> list:
     """
     Compute the event graph in a lifecycle according to Greene et al.
     Return a list of match between groups, i.e., edges of the event graph.
+    The Jaccard index of every pair of overlapping groups of two adjacent partitions is computed at once from their
+    sparse overlap matrix and their sizes.
 
     :param lc: the lifecycle object
     :param th: threshold for the Jaccard index. Defaults to 0.1 according to best results in the original paper.
@@ -209,16 +285,247 @@ def event_graph_greene(lc: object, th: float = 0.1) -> list:
     >>> # add some data and then...
     >>> events = event_graph_greene(lc, 0.1)
     """
-    events = []
-    for t in lc.temporal_ids()[0:-1]:
-        for set_name in lc.get_partition_at(t):
-            target = lc.get_group(set_name)
-            flow = lc.group_flow(set_name, "+")
-            r_names = list(flow.keys())  # names of the reference sets
-            # compute for all pair of reference sets (combinations)
-            for r in r_names:
-                merge_score = _greene_merge_score(target, lc.get_group(r))
-                if merge_score > th:
-                    events.append((t, set_name, r, merge_score))
+    return _greene_edges(lc, th)[0]
 
-    return events
+
+def _sweep(items: list, scores, thresholds: list) -> tuple:
+    """
+    Select, for each threshold, the items whose score exceeds it, keeping their order.
+    Return a dictionary keyed by threshold and valued by the selected items, and one valued by their number.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    ranked = np.sort(scores)
+    selected, counts = dict(), dict()
+    for th in thresholds:
+        keep = np.flatnonzero(scores > th).tolist()
+        selected[th] = [items[i] for i in keep]
+        counts[th] = len(ranked) - int(np.searchsorted(ranked, th, side="right"))
+    return selected, counts
+
+
+def events_asur_sweep(lc: object, thresholds: list) -> tuple:
+    """
+    Compute the events in a lifecycle according to Asur et al. for several thresholds at once.
+    The merge and split scores are computed once, for the lowest threshold, and the events of each threshold are
+    selected among them: a sweep over many thresholds costs about as much as a single call to events_asur.
+    Birth, death, and continue events do not depend on the threshold.
+
+    :param lc: the lifecycle object
+    :param thresholds: a list of thresholds for merge and split scores
+    :return: a tuple (events, counts) of dictionaries keyed by threshold. events are valued as the output of
+        events_asur for that threshold, counts by the number of events of each type
+
+    :Example:
+
+    >>> from lifecycles import Lifecycle
+    >>> from lifecycles.algorithms.classic_match import events_asur_sweep
+    >>> lc = Lifecycle()
+    >>> # add some data and then...
+    >>> events, counts = events_asur_sweep(lc, [0.1, 0.2, 0.3, 0.4, 0.5])
+    >>> counts[0.5]
+    >>> # {'merge': 3, 'split': 2, 'birth': 1, 'death': 0, 'continue': 4}
+    """
+    if len(thresholds) == 0:
+        return dict(), dict()
+    candidates = events_asur(lc, min(thresholds))
+
+    events = {th: dict() for th in thresholds}
+    counts = {th: dict() for th in thresholds}
+    for event_type, found in candidates.items():
+        if event_type in ["merge", "split"]:
+            selected, n = _sweep(found, [e["score"] for e in found], thresholds)
+        else:
+            selected = {th: list(found) for th in thresholds}
+            n = {th: len(found) for th in thresholds}
+        for th in thresholds:
+            events[th][event_type] = selected[th]
+            counts[th][event_type] = n[th]
+    return events, counts
+
+
+def event_graph_greene_sweep(lc: object, thresholds: list) -> tuple:
+    """
+    Compute the event graph in a lifecycle according to Greene et al. for several thresholds at once.
+    The Jaccard index of every pair of overlapping groups is computed once, and the edges of each threshold are
+    selected among them.
+
+    :param lc: the lifecycle object
+    :param thresholds: a list of thresholds for the Jaccard index
+    :return: a tuple (edges, counts) of dictionaries keyed by threshold. edges are valued as the output of
+        event_graph_greene for that threshold, counts by the number of edges
+
+    :Example:
+
+    >>> from lifecycles import Lifecycle
+    >>> from lifecycles.algorithms.classic_match import event_graph_greene_sweep
+    >>> lc = Lifecycle()
+    >>> # add some data and then...
+    >>> edges, counts = event_graph_greene_sweep(lc, [0.05, 0.1, 0.2, 0.3])
+    """
+    if len(thresholds) == 0:
+        return dict(), dict()
+    return _sweep(*_greene_edges(lc, min(thresholds)), thresholds)
+
+
+class GreeneTracker(object):
+    """
+    Track the dynamic communities of a LifeCycle according to Greene et al.
+    Each dynamic community has a front, i.e., its most recently observed group. The groups of each partition are
+    matched against the fronts observed up to max_gap time steps before, whenever their Jaccard index exceeds th: a
+    group matching no front gives birth to a new dynamic community, a group matching several fronts continues all of
+    them (merge), and a front matched by several groups is continued by the first one, while the others start new
+    dynamic communities sharing its history (split).
+    Candidate fronts are found through an inverted index from the elements to the fronts containing them, so each
+    group is only compared with the fronts it overlaps. Partitions are processed incrementally as they are added to
+    the LifeCycle; if an already processed partition changes, the dynamic communities are tracked again from scratch.
+
+    :param lc: a LifeCycle object
+    :param th: threshold for the Jaccard index. Defaults to 0.1 according to best results in the original paper.
+    :param max_gap: the maximum number of time steps between a group and the fronts it can match. Defaults to 1,
+        i.e., groups are only matched with the groups of the previous partition; with larger values a dynamic community
+        can be missing from up to max_gap - 1 consecutive partitions
+
+    :Reference:
+        Greene, D., Doyle, D., Cunningham, P.: Tracking the evolution of communities in dynamic social networks. In: Proceedings of the 2010 International Conference on Advances in Social Networks Analysis and Mining (ASONAM 2010), pp. 176–183. IEEE (2010)
+
+    :Example:
+
+    >>> import lifecycles as lcs
+    >>> lc = lcs.LifeCycle()
+    >>> lc.add_partition([[1,2,3], [4,5,6]])
+    >>> lc.add_partition([[1,2,3,4]])
+    >>> lc.add_partition([[1,2,3], [4,5,6]])
+    >>> tracker = lcs.GreeneTracker(lc, th=0.3, max_gap=2)
+    >>> tracker.memberships()
+    >>> # {'0_0': [0], '0_1': [1], '1_0': [0], '2_0': [0], '2_1': [1]}
+    >>> tracker.communities()
+    >>> # {0: ['0_0', '1_0', '2_0'], 1: ['0_1', '2_1']}
+    """
+
+    def __init__(self, lc: object, th: float = 0.1, max_gap: int = 1) -> None:
+        if max_gap < 1:
+            raise ValueError("max_gap must be at least 1")
+        self.lc = lc
+        self.th = th
+        self.max_gap = max_gap
+        self._reset()
+
+    def _reset(self) -> None:
+        self._processed = dict()  # tid -> version of the partition when processed
+        self._timelines = dict()  # dynamic community id -> names of its groups
+        self._memberships = dict()  # group name -> dynamic community ids
+        self._fronts = dict()  # dynamic community id -> (tid, size) of its front
+        # tid -> ids of the dynamic communities whose front is observed at tid
+        self._front_tids = defaultdict(set)
+        # element id -> ids of the dynamic communities whose front contains it
+        self._index = defaultdict(set)
+        self._front_ids = dict()  # dynamic community id -> element ids of its front
+
+    def _expire(self, tid: int) -> None:
+        # fronts observed more than max_gap time steps before tid can no longer be matched
+        for front_tid in [t for t in self._front_tids if t < tid - self.max_gap]:
+            for dyn in self._front_tids.pop(front_tid):
+                self._drop_front(dyn)
+
+    def _drop_front(self, dyn: int) -> None:
+        for e in self._front_ids.pop(dyn).tolist():
+            fronts = self._index[e]
+            fronts.discard(dyn)
+            if len(fronts) == 0:
+                del self._index[e]
+        del self._fronts[dyn]
+
+    def _match(self, ids) -> list:
+        # the dynamic communities whose front has a Jaccard index above th with the group
+        index = self._index
+        overlaps = Counter(
+            chain.from_iterable(index[e] for e in ids.tolist() if e in index)
+        )
+        matched = []
+        for dyn, overlap in overlaps.items():
+            if overlap / (len(ids) + self._fronts[dyn][1] - overlap) > self.th:
+                matched.append(dyn)
+        return sorted(matched)
+
+    def _process(self, tid: int) -> None:
+        self._expire(tid)
+        partition = self.lc.get_partition_csr(tid)
+        names = partition.names()
+        groups = [partition.group(row) for row in range(len(partition))]
+        # match all the groups before moving any front
+        matches = [self._match(ids) for ids in groups]
+
+        continued = dict()  # dynamic community id -> the group continuing it
+        for name, ids, matched in zip(names, groups, matches):
+            dyns = []
+            for dyn in matched:
+                # split: a new dynamic community with the same history
+                if dyn in continued:
+                    history = self._timelines[dyn][:-1]
+                    dyn = len(self._timelines)
+                    self._timelines[dyn] = list(history)
+                    for past in history:
+                        self._memberships[past].append(dyn)
+                dyns.append(dyn)
+            if len(dyns) == 0:  # birth
+                dyns.append(len(self._timelines))
+                self._timelines[dyns[0]] = []
+
+            self._memberships[name] = dyns
+            for dyn in dyns:
+                self._timelines[dyn].append(name)
+                continued[dyn] = (name, ids)
+
+        for dyn, (name, ids) in continued.items():
+            if dyn in self._fronts:
+                self._front_tids[self._fronts[dyn][0]].discard(dyn)
+                self._drop_front(dyn)
+            self._fronts[dyn] = (tid, len(ids))
+            self._front_ids[dyn] = ids
+            self._front_tids[tid].add(dyn)
+            for e in ids.tolist():
+                self._index[e].add(dyn)
+        self._processed[tid] = self.lc._versions[tid]
+
+    @instrumented("GreeneTracker.update", lambda res, *a, **k: len(res))
+    def update(self) -> list:
+        """
+        track the dynamic communities through the partitions added since the last update
+
+        :return: the temporal ids of the processed partitions
+        """
+        tids = self.lc.temporal_ids()
+        observed = set(tids)
+        stale = any(
+            tid not in observed or self.lc._versions[tid] != version
+            for tid, version in self._processed.items()
+        )
+        last = max(self._processed, default=-1)
+        if stale or any(tid < last for tid in tids if tid not in self._processed):
+            self._reset()
+            last = -1
+
+        updated = []
+        for tid in tids:
+            if tid > last:
+                self._process(tid)
+                updated.append(tid)
+        return updated
+
+    def communities(self) -> dict:
+        """
+        retrieve the dynamic communities, updating them first
+
+        :return: a dictionary keyed by dynamic community id and valued by the names of its groups, in temporal order
+        """
+        self.update()
+        return {dyn: list(names) for dyn, names in self._timelines.items()}
+
+    def memberships(self) -> dict:
+        """
+        retrieve the dynamic communities of each group, updating them first
+
+        :return: a dictionary keyed by group name and valued by the ids of the dynamic communities it belongs to
+        """
+        self.update()
+        return {name: list(dyns) for name, dyns in self._memberships.items()}
@@ -1,3 +1,7 @@
+from math import isnan
+
+import numpy as np
+
 from lifecycles.algorithms.measures import *
 from lifecycles.classes.classes import LifeCycle
 from lifecycles.utils import (
@@ -5,6 +9,8 @@ from lifecycles.utils import (
     forward_event_names,
     get_group_attribute_values,
 )
+from lifecycles.utils.instrumentation import instrumented
+from lifecycles.utils.parallel import map_flows
 
 __all__ = [
     "analyze_all_flows",
@@ -13,29 +19,199 @@ __all__ = [
     "facets",
     "event_weights",
     "event",
+    "EventTracker",
 ]
 
 
-def _analyze_one_struct(target, reference) -> dict:
-    # nb reference sets here are already filtered by minimum branch size
+def _step_facets(flow_matrix, min_branch_size: int = 1, rows=None) -> dict:
+    # facets of the groups of the source partition of a flow matrix (all of them, or the given rows), as arrays
+    counts, sizes = flow_matrix.counts, flow_matrix.source.sizes()
+    covered = None
+    if not flow_matrix.reference.is_disjoint():
+        covered = flow_matrix.covered(min_branch_size)
+    if rows is not None:
+        counts, sizes = counts[rows], sizes[rows]
+        covered = None if covered is None else covered[rows]
+    return batch_facets(
+        counts,
+        sizes,
+        flow_matrix.reference.sizes(),
+        min_branch_size=min_branch_size,
+        covered=covered,
+    )
+
+
+def _facets_as_dicts(facets: dict) -> list:
+    return [
+        {"U": u, "I": i, "O": o, "size": size}
+        for u, i, o, size in zip(
+            facets["U"].tolist(),
+            facets["I"].tolist(),
+            facets["O"].tolist(),
+            facets["size"].tolist(),
+        )
+    ]
+
+
+def _group_facets(lc: LifeCycle, target: str, direction: str, min_branch_size=1):
+    tid, gid = [int(i) for i in target.split("_")]
+    flow_matrix = lc.get_flow_matrix(tid, direction)
+    row = flow_matrix.source.row(gid)
+    if row < 0:
+        raise KeyError(target)
+    facets = _step_facets(flow_matrix, min_branch_size, rows=[row])
+    return _facets_as_dicts(facets)[0]
+
+
+def _analyze_attrs(lc: LifeCycle, target: str, flow: dict, attr) -> dict:
+    analysis = dict()
+    attrs_to_analyze = [attr] if isinstance(attr, str) else attr
+    for a in attrs_to_analyze:
+        target_attrs = get_group_attribute_values(lc, target, a)
+        reference_attrs = [get_group_attribute_values(lc, name, a) for name in flow]
+        analysis.update(_analyze_one_attr(target_attrs, reference_attrs, a))
+    return analysis
+
+
+def _partition_labels(lc: LifeCycle, tid: int, attrs: list) -> dict:
+    # attribute codes of the members of each group of a partition (see LifeCycle.get_partition_attribute_codes) and
+    # attribute values, keyed by attribute name
+    labels = dict()
+    for a in attrs:
+        indptr, codes = lc.get_partition_attribute_codes(tid, a)
+        if (codes < 0).any():
+            raise KeyError(f"missing {a} values for members of groups at time {tid}")
+        labels[a] = (indptr, codes, lc.get_attribute_categories(a))
+    return labels
+
+
+@instrumented("_analyze_flow_matrix", lambda res, *a, **k: len(res["size"]))
+def _analyze_flow_matrix(flow_matrix, min_branch_size: int, labels: tuple) -> dict:
+    # analysis of all the groups of the source partition of a flow matrix, as a dictionary of columns. labels is a pair
+    # of dicts holding the attribute codes and values of the source and of the reference groups (see _partition_labels)
+    columns = _step_facets(flow_matrix, min_branch_size)
+    source_labels, reference_labels = labels
+
+    for a in source_labels:
+        indptr, codes, categories = source_labels[a]
+        stats = batch_label_stats(indptr, codes, base=2, categories=categories)
+        indptr, codes, _ = reference_labels[a]
+        reference_entropy = batch_label_stats(indptr, codes, base=2)["H"]
+        columns[f"{a}_H"] = stats["H"]
+        columns[f"{a}_H_change"] = batch_facet_metadata(
+            flow_matrix.counts, stats["H"], reference_entropy, min_branch_size
+        )
+        columns[f"{a}_purity"] = stats["purity"]
+        columns[f"{a}_mca"] = stats["mca"]
+    return columns
+
 
-    ids_for_entropy = []
-    # els_in_branches = set()
-    for i, r in enumerate(reference):
-        branch = target.intersection(r)
-        ids_for_entropy.extend([str(i)] * len(branch))
-        # els_in_branches.update(branch)
-    # newels_ids = [str(j+len(reference)) for j in range(len(target.difference(els_in_branches)))]
-    # ids_for_entropy.extend(newels_ids)
+def _analysis_as_dicts(columns: dict, categories: dict) -> list:
+    # one dictionary per group from the columns returned by _analyze_flow_matrix
+    values = [columns[key].tolist() for key in columns]
+    for i, key in enumerate(columns):
+        if key.endswith("_H_change"):
+            values[i] = [None if isnan(v) else v for v in values[i]]
+        elif key.endswith("_mca"):
+            values[i] = [categories[key[: -len("_mca")]][v] for v in values[i]]
+    return [dict(zip(columns, row)) for row in zip(*values)]
 
+
+def _check_output(output: str) -> None:
+    if output not in ["dict", "array", "dataframe"]:
+        raise ValueError("output must be one of 'dict', 'array' or 'dataframe'")
+
+
+def _as_table(columns: dict, output: str):
+    # columnar result: a structured array, or a pandas DataFrame
+    if output == "dataframe":
+        import pandas as pd
+
+        return pd.DataFrame(columns)
+
+    n = len(next(iter(columns.values()))) if len(columns) > 0 else 0
+    dtype = [(key, np.asarray(column).dtype) for key, column in columns.items()]
+    table = np.empty(n, dtype=dtype)
+    for key, column in columns.items():
+        table[key] = column
+    return table
+
+
+def _facets_schema() -> dict:
+    # empty columns, with their types, of the facets returned by batch_facets
     return {
-        "U": facet_unicity(ids_for_entropy),
-        "I": facet_identity(target, reference),
-        "O": facet_outflow(target, reference),
-        "size": len(target),
+        "U": np.empty(0, dtype=np.float64),
+        "I": np.empty(0, dtype=np.float64),
+        "O": np.empty(0, dtype=np.float64),
+        "size": np.empty(0, dtype=np.int64),
     }
 
 
+def _events_schema(direction: str) -> dict:
+    # empty columns, with their types, of the tables returned by _events_columns
+    event_names = backward_event_names() if direction == "-" else forward_event_names()
+    columns = _facets_schema()
+    columns.update((name, np.empty(0, dtype=np.float64)) for name in event_names)
+    columns["event"] = np.empty(0, dtype=np.asarray(event_names).dtype)
+    columns["typicality"] = np.empty(0, dtype=np.float64)
+    return columns
+
+
+def _analysis_schema(attrs: list) -> dict:
+    # empty columns, with their types, of the tables returned by analyze_all_flows
+    columns = _facets_schema()
+    for a in attrs:
+        columns[f"{a}_H"] = np.empty(0, dtype=np.float64)
+        columns[f"{a}_H_change"] = np.empty(0, dtype=np.float64)
+        columns[f"{a}_purity"] = np.empty(0, dtype=np.float64)
+        columns[f"{a}_mca"] = np.empty(0, dtype=object)
+    return columns
+
+
+def _concat_columns(steps: list, schema: dict) -> dict:
+    # concatenate the columns of several time steps, given as (partition, columns) pairs, prepending the tid and gid
+    # of each group. schema holds the empty columns of the table, so that tables without rows keep all the columns
+    columns = {
+        "tid": [np.empty(0, dtype=np.int64)],
+        "gid": [np.empty(0, dtype=np.int64)],
+    }
+    columns.update((key, [column]) for key, column in schema.items())
+    for partition, step in steps:
+        columns["tid"].append(np.full(len(partition), partition.tid, dtype=np.int64))
+        columns["gid"].append(partition.gids)
+        for key, column in step.items():
+            columns.setdefault(key, []).append(column)
+    return {key: np.concatenate(column) for key, column in columns.items()}
+
+
+def _events_columns(facets: dict, direction: str) -> dict:
+    # facets, event weights and typicality of all the groups of a partition, from the arrays returned by batch_facets
+    event_names = backward_event_names() if direction == "-" else forward_event_names()
+    scores = _compute_event_scores(facets)
+    columns = dict(facets)
+    columns.update(zip(event_names, scores))
+
+    # same as event_typicality: the first event with the highest positive score
+    scores = np.column_stack(scores)
+    best = np.argmax(scores, axis=1)
+    typicality = scores[np.arange(len(scores)), best]
+    columns["event"] = np.where(typicality > 0, np.asarray(event_names)[best], "")
+    columns["typicality"] = np.where(typicality > 0, typicality, 0.0)
+    return columns
+
+
+@instrumented("_events_flow_matrix", lambda res, forward, *a, **k: forward.counts.nnz)
+def _events_flow_matrix(forward, direction) -> tuple:
+    # forward and backward facets of a pair of adjacent partitions, from the forward flow matrix only
+    res = [None, None]
+    if "+" in direction:
+        res[0] = _step_facets(forward)
+    if "-" in direction:
+        res[1] = _step_facets(forward.transpose())
+    return tuple(res)
+
+
+@instrumented("_analyze_one_attr", lambda res, target, *a, **k: len(target))
 def _analyze_one_attr(target, reference, attr) -> dict:
     mca, pur = purity(target)
     try:
@@ -60,7 +236,7 @@ def _event_weights_from_flow(analyzed_flows: dict, direction: str) -> dict:
     :return: a dictionary containing the event weights
     """
     if direction not in ["+", "-"]:
-        raise ValueError(f"direction must be either '+' or '-'")
+        raise ValueError("direction must be either '+' or '-'")
     res = {}
     names = backward_event_names() if direction == "-" else forward_event_names()
     for id_, analyzed_flow in analyzed_flows.items():
@@ -70,6 +246,16 @@ def _event_weights_from_flow(analyzed_flows: dict, direction: str) -> dict:
     return res
 
 
+def _event_weights_from_facets(names: list, facets: dict, direction: str) -> dict:
+    # same as _event_weights_from_flow, from the arrays returned by batch_facets
+    event_names = backward_event_names() if direction == "-" else forward_event_names()
+    scores = [score.tolist() for score in _compute_event_scores(facets)]
+    return {
+        name: dict(zip(event_names, weights))
+        for name, weights in zip(names, zip(*scores))
+    }
+
+
 def _compute_event_scores(analyzed_flow: dict) -> list:
     return [
         (analyzed_flow["U"]) * (1 - analyzed_flow["I"]) * analyzed_flow["O"],
@@ -83,14 +269,31 @@ def _compute_event_scores(analyzed_flow: dict) -> list:
     ]
 
 
-def events_all(lc: LifeCycle, direction=None) -> dict:
+@instrumented("events_all", lambda res, *a, **k: sum(len(v) for v in res.values()))
+def events_all(
+    lc: LifeCycle,
+    direction=None,
+    n_jobs: int = 1,
+    executor=None,
+    output: str = "dict",
+) -> dict:
     """
     Compute all events for a lifecycle object.
+    When both directions are requested, each pair of adjacent partitions is intersected only once and both the
+    forward and the backward events are derived from the same overlap counts.
+    Pairs of adjacent partitions are independent of each other, so they can be analyzed in parallel: each worker
+    receives only the two partitions it needs, and the results are merged in temporal order.
 
     :param lc: a LifeCycle object
     :param direction: the temporal direction in which the events are to be computed
+    :param n_jobs: the number of worker processes. 1 (default) runs in the current process, -1 uses all CPUs
+    :param executor: a concurrent.futures.Executor to run the time steps on. If provided, n_jobs is ignored
+    :param output: the format of the events of each direction. "dict" (default) returns a dictionary keyed by group
+        name and valued by the event weights; "array" and "dataframe" return a table (a NumPy structured array or a
+        pandas DataFrame) with one row per group and columns tid, gid, U, I, O, size, the weight of each event, and the
+        event and typicality given by event_typicality. Tables are built without creating per-group dictionaries
 
-    :return: a dictionary containing the events
+    :return: a dictionary containing the events, keyed by direction
 
     :Example:
 
@@ -98,19 +301,62 @@ def events_all(lc: LifeCycle, direction=None) -> dict:
     >>> # ... create a lc object here ...
     >>> events = lcs.events_all(lc, "+")
     >>> events.keys()
+    >>> events = lcs.events_all(lc, n_jobs=4) # both directions, on 4 processes
+    >>> events = lcs.events_all(lc, "+", output="dataframe")
+    >>> events["+"].columns
 
     """
     if direction is None:
         direction = ["+", "-"]
-    res = {}
     for d in direction:
-        analyzed_flows = analyze_all_flows(lc, d)
-        res[d] = _event_weights_from_flow(analyzed_flows, d)
+        if d not in ["+", "-"]:
+            raise ValueError("direction must be either '+' or '-'")
+    _check_output(output)
+    res = {d: {} for d in direction}
+
+    tids = lc.temporal_ids()[:-1]
+    steps = map_flows(
+        lc,
+        _events_flow_matrix,
+        tids,
+        "+",
+        args=[(list(direction),)] * len(tids),
+        n_jobs=n_jobs,
+        executor=executor,
+    )
+    if output != "dict":
+        for i, d in enumerate(["+", "-"]):
+            if d in direction:
+                shift = 0 if d == "+" else 1
+                columns = _concat_columns(
+                    [
+                        (lc.get_partition_csr(tid + shift), _events_columns(step[i], d))
+                        for tid, step in zip(tids, steps)
+                    ],
+                    _events_schema(d),
+                )
+                res[d] = _as_table(columns, output)
+        return res
+
+    for tid, (forward, backward) in zip(tids, steps):
+        if forward is not None:
+            names = lc.get_partition_csr(tid).names()
+            res["+"].update(_event_weights_from_facets(names, forward, "+"))
+        if backward is not None:
+            names = lc.get_partition_csr(tid + 1).names()
+            res["-"].update(_event_weights_from_facets(names, backward, "-"))
     return res
 
 
+@instrumented("analyze_all_flows", lambda res, *a, **k: len(res))
 def analyze_all_flows(
-    lc: LifeCycle, direction: str, min_branch_size: int = 1, attr=None
+    lc: LifeCycle,
+    direction: str,
+    min_branch_size: int = 1,
+    attr=None,
+    n_jobs: int = 1,
+    executor=None,
+    output: str = "dict",
 ) -> dict:
     """
     Analyze the flow of all sets in a LifeCycle object w.r.t. a given temporal direction.
@@ -119,7 +365,14 @@ def analyze_all_flows(
     :param direction: the temporal direction in which the sets are to be analyzed
     :param min_branch_size: the minimum number of elements that a branch must contain to be considered
     :param attr: the name or list of names of the attribute(s) to analyze. If None, no attribute is analyzed
-    :return:
+    :param n_jobs: the number of worker processes, each analyzing whole time steps. 1 (default) runs in the current
+        process, -1 uses all CPUs
+    :param executor: a concurrent.futures.Executor to run the time steps on. If provided, n_jobs is ignored
+    :param output: the format of the result. "dict" (default) returns a dictionary keyed by group name and valued by
+        the analysis of its flow; "array" and "dataframe" return a table (a NumPy structured array or a pandas
+        DataFrame) with one row per group, columns tid and gid, and one column per analyzed quantity. In tables, a
+        missing entropy change is nan
+    :return: the analysis of the flow of each group
 
     :Example:
 
@@ -127,18 +380,56 @@ def analyze_all_flows(
     >>> # ... create a lc object here ...
     >>> analyzed_flows = lcs.analyze_all_flows(lc, "+")
     >>> analyzed_flows.keys()
+    >>> table = lcs.analyze_all_flows(lc, "+", output="array")
+    >>> table["U"]
 
     """
-    last_id = lc.temporal_ids()[-1] if direction == "+" else lc.temporal_ids()[0]
-    return {
-        name: analyze_flow(
-            lc, name, direction, min_branch_size=min_branch_size, attr=attr
+    if direction not in ["+", "-"]:
+        raise ValueError("direction must be either '+' or '-'")
+    _check_output(output)
+    # all the partitions but the last one (the first one backward), if any
+    tids = lc.temporal_ids()[:-1] if direction == "+" else lc.temporal_ids()[1:]
+
+    attrs = [] if attr is None else [attr] if isinstance(attr, str) else list(attr)
+    shift = 1 if direction == "+" else -1
+    labels = [
+        (
+            _partition_labels(lc, tid, attrs),
+            _partition_labels(lc, tid + shift, attrs),
         )
-        for name in lc.named_sets
-        if not name.split("_")[0] == str(last_id)
-    }
+        for tid in tids
+    ]
+    steps = map_flows(
+        lc,
+        _analyze_flow_matrix,
+        tids,
+        direction,
+        args=[(min_branch_size, labels_) for labels_ in labels],
+        n_jobs=n_jobs,
+        executor=executor,
+    )
+
+    categories = {a: lc.get_attribute_categories(a) for a in attrs}
+    if output != "dict":
+        for step in steps:
+            for a in attrs:
+                step[f"{a}_mca"] = np.asarray(categories[a], dtype=object)[
+                    step[f"{a}_mca"]
+                ]
+        columns = _concat_columns(
+            [(lc.get_partition_csr(tid), step) for tid, step in zip(tids, steps)],
+            _analysis_schema(attrs),
+        )
+        return _as_table(columns, output)
+
+    res = dict()
+    for tid, step in zip(tids, steps):
+        names = lc.get_partition_csr(tid).names()
+        res.update(zip(names, _analysis_as_dicts(step, categories)))
+    return res
 
 
+@instrumented("analyze_flow")
 def analyze_flow(
     lc: LifeCycle, target: str, direction: str, min_branch_size=1, attr: str = None
 ) -> dict:
@@ -163,17 +454,13 @@ def analyze_flow(
     >>> analysis = lcs.analyze_flow(lc, "1_0", "+")
 
     """
-    flow = lc.group_flow(target, direction=direction, min_branch_size=min_branch_size)
-
-    reference_sets = [lc.get_group(name) for name in flow]
-    analysis = _analyze_one_struct(lc.get_group(target), reference_sets)
+    analysis = _group_facets(lc, target, direction, min_branch_size=min_branch_size)
 
     if attr is not None:
-        attrs_to_analyze = [attr] if isinstance(attr, str) else attr
-        for a in attrs_to_analyze:
-            target_attrs = get_group_attribute_values(lc, target, a)
-            reference_attrs = [get_group_attribute_values(lc, name, a) for name in flow]
-            analysis.update(_analyze_one_attr(target_attrs, reference_attrs, a))
+        flow = lc.group_flow(
+            target, direction, min_branch_size=min_branch_size, counts_only=True
+        )
+        analysis.update(_analyze_attrs(lc, target, flow, attr))
     return analysis
 
 
@@ -196,11 +483,7 @@ def facets(lc: LifeCycle, target: str, direction: str) -> dict:
     dict_keys(['U', 'I', 'O', 'size'])
 
     """
-    flow = lc.group_flow(target, direction=direction)
-
-    reference_sets = [lc.get_group(name) for name in flow]
-    facets = _analyze_one_struct(lc.get_group(target), reference_sets)
-    return facets
+    return _group_facets(lc, target, direction)
 
 
 def event_weights(lc: LifeCycle, target: str, direction: str) -> dict:
@@ -254,3 +537,89 @@ def event(lc, target, direction=None):
     if "+" in direction:
         forward = event_typicality(event_weights(lc, target, "+"))
     return {"+": forward, "-": back}
+
+
+class EventTracker(object):
+    """
+    Keep the events of a LifeCycle up to date as partitions are added.
+    The event weights of each pair of adjacent partitions are cached, and only the pairs whose partitions changed
+    since the last update are recomputed: after an add_partition, these are the forward events of the previous
+    partition and the backward events of the new one. Pairs touched by filter_on_group_size are recomputed as well.
+
+    :param lc: a LifeCycle object
+    :param direction: the temporal direction(s) in which the events are to be tracked. Defaults to both
+
+    :Example:
+
+    >>> import lifecycles as lcs
+    >>> lc = lcs.LifeCycle()
+    >>> tracker = lcs.EventTracker(lc)
+    >>> lc.add_partition([[1,2], [3,4,5]])
+    >>> lc.add_partition([[1,2,3], [4,5]])
+    >>> events = tracker.events() # same as lcs.events_all(lc)
+    >>> lc.add_partition([[1,2,3,4,5]])
+    >>> events = tracker.events() # only the pair (1, 2) is analyzed
+    """
+
+    def __init__(self, lc: LifeCycle, direction=None) -> None:
+        if direction is None:
+            direction = ["+", "-"]
+        for d in direction:
+            if d not in ["+", "-"]:
+                raise ValueError("direction must be either '+' or '-'")
+        self.lc = lc
+        self.direction = list(direction)
+        self._steps = dict()  # tid -> (versions of tid and tid + 1, event weights)
+
+    def _versions(self, tid: int) -> tuple:
+        return self.lc._versions[tid], self.lc._versions[tid + 1]
+
+    def update(self) -> list:
+        """
+        recompute the events of the pairs of adjacent partitions that changed since the last update
+
+        :return: the temporal ids of the recomputed pairs, each identified by its earliest partition
+        """
+        tids = self.lc.temporal_ids()[:-1]
+        for tid in set(self._steps) - set(tids):
+            del self._steps[tid]
+
+        updated = []
+        for tid in tids:
+            versions = self._versions(tid)
+            if tid in self._steps and self._steps[tid][0] == versions:
+                continue
+            forward, backward = _events_flow_matrix(
+                self.lc.get_flow_matrix(tid, "+"), self.direction
+            )
+            weights = dict()
+            if forward is not None:
+                names = self.lc.get_partition_csr(tid).names()
+                weights["+"] = _event_weights_from_facets(names, forward, "+")
+            if backward is not None:
+                names = self.lc.get_partition_csr(tid + 1).names()
+                weights["-"] = _event_weights_from_facets(names, backward, "-")
+            self._steps[tid] = (versions, weights)
+            updated.append(tid)
+        return updated
+
+    def events(self, direction=None) -> dict:
+        """
+        retrieve all the events of the LifeCycle, updating the stale ones first.
+        See events_all for details
+
+        :param direction: the temporal direction(s) of the events. Defaults to the tracked ones
+        :return: a dictionary containing the events
+        """
+        if direction is None:
+            direction = self.direction
+        for d in direction:
+            if d not in self.direction:
+                raise ValueError(f"direction {d} is not tracked")
+
+        self.update()
+        res = {d: {} for d in direction}
+        for tid in sorted(self._steps):
+            for d in direction:
+                res[d].update(self._steps[tid][1][d])
+        return res
@@ -12,12 +12,26 @@ __all__ = [
     "facet_identity",
     "facet_outflow",
     "facet_metadata",
+    "batch_facets",
+    "batch_label_stats",
+    "batch_facet_metadata",
     "purity",
     "event_typicality",
     "stability",
 ]
 
 
+def _sorted_labels(labels) -> list:
+    """
+    sort distinct labels in the order used to break ties between the most common values: by value, or by type name
+    and representation when the values cannot be compared
+    """
+    try:
+        return sorted(labels)
+    except TypeError:
+        return sorted(labels, key=lambda label: (type(label).__name__, repr(label)))
+
+
 def _entropy(labels: list, base=2) -> float:
     """
     computes the Shannon entropy of a list of labels
@@ -178,6 +192,172 @@ def facet_outflow(target: set, reference: list) -> float:
         return 1.0
 
 
+def batch_facets(
+    counts,
+    sizes,
+    reference_sizes,
+    min_branch_size: int = 1,
+    covered=None,
+) -> dict:
+    """
+    compute the unicity, identity and outflow facets of all the groups of a partition at once, from the overlap counts
+    between the partition and an adjacent (reference) one. The results match those of facet_unicity, facet_identity
+    and facet_outflow computed group by group.
+
+    :param counts: the (groups x reference groups) contingency matrix of overlap counts, sparse or dense
+    :param sizes: the size of each group
+    :param reference_sizes: the size of each reference group
+    :param min_branch_size: the minimum overlap for a reference group to be considered a branch
+    :param covered: the number of elements of each group that belong to at least one of its branches.
+        If None, the reference groups are assumed to be disjoint, so that it equals the sum of the branch sizes
+    :return: a dictionary of arrays keyed by 'U', 'I', 'O' and 'size'
+
+    :Example:
+
+    >>> res = batch_facets([[2, 0], [1, 2]], [2, 3], [3, 2])
+    >>> res["U"], res["O"]
+    (array([1.        , 0.33333333]), array([0., 0.]))
+    """
+    import scipy.sparse as sp
+
+    counts = sp.csr_matrix(counts)
+    sizes = np.asarray(sizes)
+    reference_sizes = np.asarray(reference_sizes)
+    n = counts.shape[0]
+
+    rows = np.repeat(np.arange(n), np.diff(counts.indptr))
+    cols = counts.indices
+    data = counts.data.astype(np.int64)
+    keep = data >= max(min_branch_size, 1)
+    rows, cols, data = rows[keep], cols[keep], data[keep]
+
+    n_branches = np.bincount(rows, minlength=n)
+    persistent = np.bincount(rows, weights=data, minlength=n)
+
+    # unicity: difference between the two largest branches, relative to the persistent elements
+    unicity = np.ones(n)
+    multi = n_branches >= 2
+    if multi.any():
+        largest = data[np.lexsort((-data, rows))]
+        first = np.cumsum(n_branches) - n_branches
+        top, second = largest[first[multi]], largest[first[multi] + 1]
+        unicity[multi] = top / persistent[multi] - second / persistent[multi]
+
+    # identity: branch sizes weighted by the share of the reference group they represent
+    identity = np.zeros(n)
+    weights = np.bincount(
+        rows, weights=data * data / reference_sizes[cols], minlength=n
+    )
+    np.divide(weights, persistent, out=identity, where=persistent > 0)
+
+    # outflow: share of the group not found in any branch
+    covered = persistent if covered is None else np.asarray(covered)
+    outflow = np.ones(n)
+    np.divide(sizes - covered, sizes, out=outflow, where=sizes > 0)
+
+    return {"U": unicity, "I": identity, "O": outflow, "size": sizes}
+
+
+def batch_label_stats(indptr, codes, base: int = 2, categories: list = None) -> dict:
+    """
+    compute the normalized attribute entropy, the purity and the most common attribute value of all the groups of a
+    partition at once, from the categorical codes of their members.
+    Label histograms are computed once for all groups, and the results match those of _normalized_shannon_entropy
+    (0 for groups with a single label value) and purity computed group by group. Ties between the most common values
+    are broken as in purity, in favor of the smallest value, so the result does not depend on the order of the group
+    members.
+
+    :param indptr: the group offsets: the codes of the i-th group are codes[indptr[i]:indptr[i+1]]
+    :param codes: the non-negative attribute codes of the group members
+    :param base: the base of the logarithm
+    :param categories: the attribute values, positioned by code. If None, ties are broken in favor of the smallest code
+    :return: a dictionary of arrays keyed by 'H', 'purity' and 'mca' (the code of the most common value, -1 for empty
+        groups)
+
+    :Example:
+
+    >>> res = batch_label_stats([0, 3, 5], [0, 1, 1, 2, 2])
+    >>> res["purity"], res["mca"]
+    (array([0.66666667, 1.        ]), array([1, 2]))
+    """
+    base = e if base is None else base
+    indptr = np.asarray(indptr, dtype=np.int64)
+    codes = np.asarray(codes, dtype=np.int64)
+    n = len(indptr) - 1
+    sizes = np.diff(indptr)
+    rows = np.repeat(np.arange(n), sizes)
+
+    # histogram: one entry per (group, value) pair, in order of first appearance within each group
+    keys = rows * (codes.max(initial=-1) + 1) + codes
+    keys, first, counts = np.unique(keys, return_index=True, return_counts=True)
+    order = np.argsort(first, kind="stable")
+    first, counts, pair_rows = first[order], counts[order], rows[first[order]]
+    n_values = np.bincount(pair_rows, minlength=n)
+
+    # entropy, with the logarithms of the (few) distinct frequencies computed as in _entropy
+    p = counts / sizes[pair_rows]
+    uniques, inverse = np.unique(p, return_inverse=True)
+    logs = np.array([log(v, base) for v in uniques.tolist()])[inverse.ravel()]
+    entropy = -np.bincount(pair_rows, weights=p * logs, minlength=n)
+    max_entropy = np.array([log(k, base) if k > 1 else 0 for k in n_values.tolist()])
+    entropy = np.divide(entropy, max_entropy, out=np.zeros(n), where=n_values > 1)
+
+    # most common value: largest count, then smallest value
+    pair_codes = codes[first]
+    if categories is not None and len(pair_codes) > 0:
+        # rank the codes by value
+        index = {value: code for code, value in enumerate(categories)}
+        ranks = np.empty(len(categories), dtype=np.int64)
+        ranks[[index[value] for value in _sorted_labels(categories)]] = np.arange(
+            len(categories)
+        )
+        pair_codes = ranks[pair_codes]
+    mca = np.full(n, -1, dtype=np.int64)
+    purity = np.full(n, np.nan)
+    best = np.lexsort((pair_codes, -counts, pair_rows))
+    starts = (np.cumsum(n_values) - n_values)[n_values > 0]
+    mca[n_values > 0] = codes[first[best[starts]]]
+    purity[n_values > 0] = counts[best[starts]] / sizes[n_values > 0]
+
+    return {"H": entropy, "purity": purity, "mca": mca}
+
+
+def batch_facet_metadata(
+    counts, entropy, reference_entropy, min_branch_size: int = 1
+) -> np.ndarray:
+    """
+    compute the change in attribute entropy of all the groups of a partition at once, from the overlap counts between
+    the partition and an adjacent (reference) one. The results match those of facet_metadata computed group by group.
+
+    :param counts: the (groups x reference groups) contingency matrix of overlap counts, sparse or dense
+    :param entropy: the normalized attribute entropy of each group (see batch_label_stats)
+    :param reference_entropy: the normalized attribute entropy of each reference group
+    :param min_branch_size: the minimum overlap for a reference group to be considered a branch. If lower than 1, all
+        the reference groups are branches
+    :return: an array with the entropy change of each group, nan for groups without branches
+    """
+    import scipy.sparse as sp
+
+    counts = sp.csr_matrix(counts)
+    entropy = np.asarray(entropy)
+    reference_entropy = np.asarray(reference_entropy)
+    n, m = counts.shape
+
+    if min_branch_size < 1:
+        rows, cols = np.repeat(np.arange(n), m), np.tile(np.arange(m), n)
+    else:
+        rows = np.repeat(np.arange(n), np.diff(counts.indptr))
+        keep = counts.data >= min_branch_size
+        rows, cols = rows[keep], counts.indices[keep]
+
+    n_branches = np.bincount(rows, minlength=n)
+    total = np.bincount(rows, weights=reference_entropy[cols], minlength=n)
+    res = np.full(n, np.nan)
+    np.divide(total, n_branches, out=res, where=n_branches > 0)
+    res[n_branches > 0] = entropy[n_branches > 0] - res[n_branches > 0]
+    return res
+
+
 def facet_metadata(
     target_labels: list, reference_labels: list, base: int = None
 ) -> Union[float, None]:
@@ -231,7 +411,8 @@ def stability(lc: object, direction: str) -> float:
 
 def purity(labels: list) -> Tuple[str, float]:
     """
-    compute the purity of a set of labels. Purity is defined as the relative frequency of the most frequent attribute value
+    compute the purity of a set of labels. Purity is defined as the relative frequency of the most frequent attribute value.
+    Ties between the most frequent values are broken in favor of the smallest one
 
     :param labels: the list of labels
     :return: a tuple of the most frequent attribute value and its frequency
@@ -240,8 +421,14 @@ def purity(labels: list) -> Tuple[str, float]:
 
     >>> purity(['a','a','b','b','b'])
     ('b', 0.6)
+    >>> purity(['b','a'])
+    ('a', 0.5)
     """
-    most_common_attribute, freq = Counter(labels).most_common(1)[0]
+    counter = Counter(labels)
+    freq = max(counter.values())
+    most_common_attribute = _sorted_labels(
+        [label for label, count in counter.items() if count == freq]
+    )[0]
     return most_common_attribute, freq / len(labels)
 
 
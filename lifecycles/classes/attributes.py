@@ -0,0 +1,187 @@
+from itertools import islice
+
+import numpy as np
+
+__all__ = ["CategoricalAttribute"]
+
+
+def _code_dtype(n_categories: int) -> type:
+    # the smallest signed integer type able to hold the codes (and -1 for missing values)
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories <= np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+class CategoricalAttribute(object):
+    """
+    A temporal attribute of the elements of a LifeCycle, stored as a matrix of categorical codes.
+    Entry (i, t) is the code of the value taken at time t by the element with interned id i, -1 if the value is
+    missing. Codes index the list of categories, which are registered in order of first appearance; codes use the
+    smallest integer type able to hold them. The matrix is a view on a larger buffer that grows geometrically, so that
+    setting the values of one more element or temporal id at a time does not copy the whole matrix at each call.
+
+    :Example:
+    >>> attr = CategoricalAttribute()
+    >>> attr.set_values([0, 1, 1], [0, 0, 1], ["red", "blue", "red"])
+    >>> attr.categories
+    ['red', 'blue']
+    >>> attr.codes
+    array([[ 0, -1],
+           [ 1,  0]], dtype=int8)
+    """
+
+    __slots__ = ["categories", "_buffer", "_shape", "_index"]
+
+    def __init__(self) -> None:
+        self.categories = list()
+        self.codes = np.full((0, 0), -1, dtype=np.int8)
+        self._index = dict()
+
+    @property
+    def codes(self) -> np.ndarray:
+        rows, cols = self._shape
+        return self._buffer[:rows, :cols]
+
+    @codes.setter
+    def codes(self, codes: np.ndarray) -> None:
+        self._buffer = codes
+        self._shape = codes.shape
+
+    def encode(self, values) -> np.ndarray:
+        """
+        retrieve the codes of the given values, registering unseen values as new categories.
+        Arrays of a non-object dtype are encoded without Python-level loops over their items.
+
+        :param values: an iterable of hashable values
+        :return: an array of codes
+        """
+        index, categories = self._index, self.categories
+        if isinstance(values, np.ndarray) and values.dtype != object:
+            uniques, first, inverse = np.unique(
+                values, return_index=True, return_inverse=True
+            )
+            order = np.argsort(first, kind="stable")
+            unique_codes = np.empty(len(uniques), dtype=np.int64)
+            for i, value in zip(order.tolist(), uniques[order].tolist()):
+                unique_codes[i] = index.setdefault(value, len(index))
+            codes = unique_codes[inverse.ravel()]
+        else:
+            codes = np.fromiter(
+                (index.setdefault(value, len(index)) for value in values),
+                dtype=np.int64,
+            )
+        if len(index) > len(categories):
+            categories.extend(islice(index, len(categories), None))
+        return codes
+
+    def _reserve(self, n_elements: int, n_tids: int) -> None:
+        # grow the code matrix (and widen its type) to fit the given shape and the registered categories. The buffer
+        # is reallocated only when it is too small (then growing by at least half of its size) or too narrow
+        dtype = np.promote_types(self._buffer.dtype, _code_dtype(len(self.categories)))
+        rows, cols = self._shape
+        n_rows, n_cols = max(n_elements, rows), max(n_tids, cols)
+        capacity_rows, capacity_cols = self._buffer.shape
+        if n_rows > capacity_rows:
+            capacity_rows = max(n_rows, capacity_rows * 3 // 2)
+        if n_cols > capacity_cols:
+            capacity_cols = max(n_cols, capacity_cols * 3 // 2)
+        capacity = (capacity_rows, capacity_cols)
+        if capacity != self._buffer.shape or dtype != self._buffer.dtype:
+            buffer = np.full(capacity, -1, dtype=dtype)
+            buffer[:rows, :cols] = self.codes
+            self._buffer = buffer
+        self._shape = (n_rows, n_cols)
+
+    def set_values(self, ids, tids, values) -> None:
+        """
+        set the values taken by some elements at some temporal ids
+
+        :param ids: the interned ids of the elements
+        :param tids: the temporal ids, one per element id
+        :param values: the values, one per element id
+        :return: None
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        tids = np.asarray(tids, dtype=np.int64)
+        codes = self.encode(values)
+        if not len(ids) == len(tids) == len(codes):
+            raise ValueError("ids, tids and values must have the same length")
+        if len(ids) == 0:
+            return
+        if tids.min() < 0:
+            raise ValueError("temporal ids must be non-negative")
+        self._reserve(int(ids.max()) + 1, int(tids.max()) + 1)
+        self.codes[ids, tids] = codes
+
+    def gather(self, ids, tid: int) -> np.ndarray:
+        """
+        retrieve the codes of some elements at a given temporal id
+
+        :param ids: an array of interned ids
+        :param tid: the temporal id
+        :return: an array of codes, -1 where the value is missing
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        res = np.full(len(ids), -1, dtype=self.codes.dtype)
+        if 0 <= tid < self.codes.shape[1]:
+            inside = (ids >= 0) & (ids < self.codes.shape[0])
+            res[inside] = self.codes[ids[inside], tid]
+        return res
+
+    def decode(self, codes) -> list:
+        """
+        retrieve the values corresponding to the given (non-missing) codes
+
+        :param codes: an iterable of codes
+        :return: a list of values
+        """
+        categories = self.categories
+        if isinstance(codes, np.ndarray):
+            codes = codes.tolist()
+        return [categories[c] for c in codes]
+
+    def element_values(self, id_: int) -> dict:
+        """
+        retrieve all the values taken by an element
+
+        :param id_: the interned id of the element
+        :return: a dictionary keyed by temporal id and valued by the attribute value
+        """
+        if not 0 <= id_ < self.codes.shape[0]:
+            return dict()
+        tids = np.flatnonzero(self.codes[id_] >= 0)
+        return dict(zip(tids.tolist(), self.decode(self.codes[id_, tids])))
+
+    def to_dict(self, elements: list) -> dict:
+        """
+        decode the attribute to a nested dictionary
+
+        :param elements: the interned elements, positioned by id
+        :return: a dictionary keyed by element and valued by a dictionary keyed by temporal id and valued by the
+            attribute value. Elements without values are omitted
+        """
+        ids, tids = np.nonzero(self.codes >= 0)
+        values = self.decode(self.codes[ids, tids])
+        res = dict()
+        for id_, tid, value in zip(ids.tolist(), tids.tolist(), values):
+            element = elements[id_]
+            if element not in res:
+                res[element] = dict()
+            res[element][tid] = value
+        return res
+
+    def restrict(self, tids: list) -> "CategoricalAttribute":
+        """
+        copy the attribute, keeping only the values taken at the given temporal ids
+
+        :param tids: the temporal ids to keep
+        :return: a CategoricalAttribute sharing the categories of this one
+        """
+        res = CategoricalAttribute()
+        res.categories = list(self.categories)
+        res._index = dict(self._index)
+        res.codes = np.full_like(self.codes, -1)
+        keep = [tid for tid in tids if 0 <= tid < self.codes.shape[1]]
+        res.codes[:, keep] = self.codes[:, keep]
+        return res
@@ -1,5 +1,20 @@
 import json
+import os
 from collections import defaultdict
+from collections.abc import Mapping
+
+import numpy as np
+
+from lifecycles.classes.attributes import CategoricalAttribute
+from lifecycles.classes.flows import FlowMatrix
+from lifecycles.classes.storage import (
+    CSRGroupStore,
+    CSRPartition,
+    ElementInterner,
+    LazyPartitions,
+    MappedInterner,
+)
+from lifecycles.utils.instrumentation import instrumented
 
 __all__ = ["LifeCycle"]
 
@@ -10,22 +25,42 @@ class LifeCycle(object):
 
     :param dtype: the datatype of the elements in the groups.
     Supported types are int, float, str, list, and dict.
+    :param backend: the storage backend of the groups. Either "sets" (default), which keeps each group as a Python set,
+    or "csr", which interns elements to dense int32 ids and keeps each partition as compressed sparse row arrays.
+    The "csr" backend uses far less memory on large lifecycles; groups are decoded into sets on access.
 
     :return: a LifeCycle object
 
     :Example:
     >>> lc = LifeCycle(dtype=int) # accepts int elements
     >>> lc = LifeCycle(dtype=str) # accepts str elements
+    >>> lc = LifeCycle(dtype=int, backend="csr") # array-backed storage
     """
 
-    def __init__(self, dtype: type = int) -> None:
+    def __init__(self, dtype: type = int, backend: str = "sets") -> None:
+
+        if backend not in ["sets", "csr"]:
+            raise ValueError("backend must either be 'sets' or 'csr'")
 
         self.dtype = dtype
+        self.backend = backend
+        self._clear()
+        self._versions = defaultdict(int)  # tid -> number of changes to the partition
 
+    def _clear(self, interner: ElementInterner = None) -> None:
+        """
+        discard the groups, attributes and caches of the LifeCycle, keeping its dtype and backend
+        """
         self.tids = []
-        self.named_sets = defaultdict(set)
+        self._interner = ElementInterner() if interner is None else interner
+        if self.backend == "csr":
+            self.named_sets = CSRGroupStore(self._interner)
+        else:
+            self.named_sets = defaultdict(set)
         self.tid_to_named_sets = defaultdict(list)
-        self.attributes = defaultdict(dict)
+        self.attributes = dict()  # attribute name -> CategoricalAttribute
+        self._memberships = None  # element -> group names, built on first use
+        self._flows = dict()  # (tid, ref_tid) -> FlowMatrix, built on first use
 
     ############################## Convenience get methods ##########################################
     def temporal_ids(self) -> list:
@@ -58,20 +93,31 @@ class LifeCycle(object):
         >>> sliced = lc.slice(0, 1)
 
         """
-        temp = LifeCycle(self.dtype)
+        temp = LifeCycle(self.dtype, backend=self.backend)
         temp.tids = self.tids[start:end]
-        temp.named_sets = {
-            k: v
-            for k, v in self.named_sets.items()
-            if int(k.split("_")[0]) in temp.tids
-        }
+        temp._interner = self._interner
+        if self.backend == "csr":
+            temp.named_sets = self.named_sets.subset(temp.tids)
+        else:
+            temp.named_sets = {
+                k: v
+                for k, v in self.named_sets.items()
+                if int(k.split("_")[0]) in temp.tids
+            }
         temp.tid_to_named_sets = {
             k: v for k, v in self.tid_to_named_sets.items() if int(k) in temp.tids
         }
-        temp_attrs = {}
-        for attr_name, attr in self.attributes.items():
-            temp_attrs[attr_name] = {k: v for k, v in attr.items() if k in temp.tids}
-        temp.attributes = temp_attrs
+        if self._memberships is not None:
+            kept = {str(tid) for tid in temp.tids}
+            temp._memberships = defaultdict(list)
+            for element, names in self._memberships.items():
+                names = [name for name in names if name.split("_")[0] in kept]
+                if len(names) > 0:
+                    temp._memberships[element] = names
+        temp.attributes = {
+            attr_name: attr.restrict(temp.tids)
+            for attr_name, attr in self.attributes.items()
+        }
         return temp
 
     def universe_set(self) -> set:
@@ -88,6 +134,9 @@ class LifeCycle(object):
         >>> lc.universe_set()
         {1, 2, 3, 4, 5, 6, 7, 8}
         """
+        if self.backend == "csr":
+            return set(self._interner.decode(self.named_sets.universe_ids()))
+
         universe = set()
         for set_ in self.named_sets.values():
             universe = universe.union(set_)
@@ -127,30 +176,43 @@ class LifeCycle(object):
 
         tid = len(self.tids)
         self.tids.append(tid)
+        self._invalidate_flows([tid])
 
-        for i, group in enumerate(partition):
+        groups = [self._normalize_group(group) for group in partition]
+        for i, group in enumerate(groups):
             name = str(tid) + "_" + str(i)
             self.tid_to_named_sets[str(tid)].append(name)
+            if self.backend == "sets":
+                self.named_sets[name] = group
 
-            if self.dtype in [int, float, str]:
-                try:
-                    self.named_sets[name] = set(group)
-                except TypeError:  # group is not iterable (only 1 elem)
-                    tmp = set()
-                    tmp.add(group)
-                    self.named_sets[name] = tmp
-
-            elif self.dtype == dict:
-                for elem in group:
-                    to_str = json.dumps(elem)
-                    self.named_sets[name].add(to_str)
-
-            elif self.dtype == list:
-                for elem in group:
-                    to_str = str(elem)
-                    self.named_sets[name].add(to_str)
-            else:
-                raise NotImplementedError("dtype not supported")
+        if self.backend == "csr":
+            self.named_sets.add_partition(tid, groups)
+
+        if self._memberships is not None:
+            for i, group in enumerate(groups):
+                name = str(tid) + "_" + str(i)
+                for element in group:
+                    self._memberships[element].append(name)
+
+    def _normalize_group(self, group: object) -> set:
+        """
+        convert a group to a set of hashable elements according to the dtype of the LifeCycle
+        """
+        if self.dtype in [int, float, str]:
+            try:
+                return set(group)
+            except TypeError:  # group is not iterable (only 1 elem)
+                tmp = set()
+                tmp.add(group)
+                return tmp
+
+        elif self.dtype == dict:
+            return {json.dumps(elem) for elem in group}
+
+        elif self.dtype == list:
+            return {str(elem) for elem in group}
+        else:
+            raise NotImplementedError("dtype not supported")
 
     def add_partitions_from(self, partitions: list) -> None:
         """
@@ -190,6 +252,34 @@ class LifeCycle(object):
             return []
         return self.tid_to_named_sets[str(tid)]
 
+    def get_partition_csr(self, tid: int) -> CSRPartition:
+        """
+        retrieve a partition in compressed sparse row (CSR) form.
+        Elements are represented by dense int32 ids shared by all the partitions of the LifeCycle.
+        With the "csr" backend the stored arrays are returned, otherwise they are built on the fly.
+
+        :param tid: the id of the partition to retrieve
+        :return: a CSRPartition; the members of its i-th group are indices[indptr[i]:indptr[i+1]]
+
+        :Example:
+        >>> lc = LifeCycle(backend="csr")
+        >>> lc.add_partition([[1,2], [3,4,5]])
+        >>> p = lc.get_partition_csr(0)
+        >>> p.indptr
+        array([0, 2, 5])
+        >>> p.names()
+        ['0_0', '0_1']
+        """
+        if self.backend == "csr":
+            return self.named_sets.partition(tid)
+
+        names = self.get_partition_at(tid)
+        return CSRPartition.from_groups(
+            tid,
+            [int(name.split("_")[1]) for name in names],
+            [self._interner.intern(self.named_sets[name]) for name in names],
+        )
+
     ############################## Attribute methods ##########################################
     def set_attributes(self, attributes: dict, attr_name: str) -> None:
         """
@@ -197,6 +287,7 @@ class LifeCycle(object):
 
         The temporal attributes must be provided as a dictionary keyed by the element id and valued by a dictionary
         keyed by the temporal id and valued by the attribute value.
+        Values are stored as categorical codes, see set_attribute_values.
 
         :param attr_name: the name of the attribute
         :param attributes: a dictionary of temporal attributes
@@ -213,7 +304,85 @@ class LifeCycle(object):
         >>> }
         >>> lc.set_attributes(attributes, attr_name="color")
         """
-        self.attributes[attr_name] = attributes
+        elements, tids, values = [], [], []
+        for element, temporal_values in attributes.items():
+            for tid, value in temporal_values.items():
+                elements.append(element)
+                tids.append(tid)
+                values.append(value)
+
+        self.attributes[attr_name] = CategoricalAttribute()
+        self.set_attribute_values(attr_name, elements, tids, values)
+
+    def set_attribute_values(
+        self, attr_name: str, elements, tids, values, replace: bool = False
+    ) -> None:
+        """
+        set the values of a temporal attribute in bulk, from three aligned arrays (or lists): the i-th element takes
+        the i-th value at the i-th temporal id.
+        Each attribute is stored as a matrix of categorical codes indexed by (element, temporal id), which takes far
+        less memory than a dictionary of dictionaries; arrays of a non-object dtype are encoded without Python-level
+        loops over their items.
+
+        :param attr_name: the name of the attribute
+        :param elements: the elements
+        :param tids: the temporal ids
+        :param values: the attribute values
+        :param replace: if True, the values already set for the attribute are discarded. Otherwise (default), they are
+            updated
+        :return: None
+
+        :Example:
+
+        >>> lc = LifeCycle()
+        >>> lc.add_partition([[1,2], [3,4,5]])
+        >>> lc.add_partition([[1,2,3], [4,5]])
+        >>> lc.set_attribute_values("color", [1, 1, 2], [0, 1, 0], ["red", "blue", "green"])
+        >>> lc.get_attributes("color", of=1)
+        {0: 'red', 1: 'blue'}
+        """
+        if replace or attr_name not in self.attributes:
+            self.attributes[attr_name] = CategoricalAttribute()
+
+        if isinstance(elements, np.ndarray):
+            uniques, inverse = np.unique(elements, return_inverse=True)
+            ids = self._interner.intern(uniques.tolist())[inverse.ravel()]
+        else:
+            ids = self._interner.intern(elements)
+        self.attributes[attr_name].set_values(ids, tids, values)
+
+    def set_attributes_from_dataframe(
+        self,
+        df: object,
+        attr_name: str,
+        element_col: str = "element",
+        tid_col: str = "tid",
+        value_col: str = None,
+    ) -> None:
+        """
+        set the values of a temporal attribute from a (long format) pandas DataFrame having one row per element and
+        temporal id. See set_attribute_values for details
+
+        :param df: a pandas DataFrame
+        :param attr_name: the name of the attribute
+        :param element_col: the column holding the elements
+        :param tid_col: the column holding the temporal ids
+        :param value_col: the column holding the attribute values. Defaults to attr_name
+        :return: None
+
+        :Example:
+
+        >>> import pandas as pd
+        >>> df = pd.DataFrame({"element": [1, 1, 2], "tid": [0, 1, 0], "color": ["red", "blue", "green"]})
+        >>> lc.set_attributes_from_dataframe(df, "color")
+        """
+        value_col = attr_name if value_col is None else value_col
+        self.set_attribute_values(
+            attr_name,
+            df[element_col].to_numpy(),
+            df[tid_col].to_numpy(),
+            df[value_col].to_numpy(),
+        )
 
     def get_attributes(self, attr_name, of=None) -> dict:
         """
@@ -242,11 +411,76 @@ class LifeCycle(object):
 
         """
         if of is None:
-            return self.attributes[attr_name]
+            if attr_name not in self.attributes:
+                return dict()
+            return self.attributes[attr_name].to_dict(self._interner.elements())
+
+        values = self.attributes[attr_name].element_values(self._interner.lookup(of))
+        if len(values) == 0:
+            raise KeyError(of)
+        return values
+
+    def get_attribute_categories(self, attr_name: str) -> list:
+        """
+        retrieve the distinct values of an attribute, positioned by categorical code
+
+        :param attr_name: the name of the attribute
+        :return: a list of attribute values
+
+        :Example:
+
+        >>> lc.get_attribute_categories("color")
+        >>> # ['red', 'blue', 'green', 'magenta']
+        """
+        return self.attributes[attr_name].categories
+
+    def get_group_attribute_codes(self, target: str, attr_name: str) -> np.ndarray:
+        """
+        retrieve the categorical codes of the attribute values taken by the members of a group at the time the group
+        is observed, with a single vectorized gather. Codes index the list returned by get_attribute_categories.
+
+        :param target: the name of the group
+        :param attr_name: the name of the attribute
+        :return: an array of codes, one per member of the group, -1 where the value is missing
+
+        :Example:
+
+        >>> lc.get_group_attribute_codes("0_0", "color")
+        >>> # array([0, 2], dtype=int8)
+        """
+        tid = int(target.split("_")[0])
+        return self.attributes[attr_name].gather(self._group_ids(target), tid)
+
+    def get_partition_attribute_codes(self, tid: int, attr_name: str) -> tuple:
+        """
+        retrieve the categorical codes of the attribute values taken by the members of all the groups observed at a
+        given time, in compressed sparse row form. Members are in the same order as in get_group_attribute_codes.
+
+        :param tid: the temporal id of the partition
+        :param attr_name: the name of the attribute
+        :return: a tuple (indptr, codes): the codes of the i-th group of the partition are codes[indptr[i]:indptr[i+1]],
+            -1 where the value is missing
+
+        :Example:
+
+        >>> indptr, codes = lc.get_partition_attribute_codes(0, "color")
+        """
+        if self.backend == "csr":
+            partition = self.named_sets.partition(tid)
+            indptr, ids = partition.indptr, partition.indices
         else:
-            return self.attributes[attr_name][of]
+            groups = [self._group_ids(name) for name in self.get_partition_at(tid)]
+            indptr = np.zeros(len(groups) + 1, dtype=np.int64)
+            np.cumsum([len(g) for g in groups], out=indptr[1:])
+            ids = np.concatenate(groups) if len(groups) > 0 else np.empty(0)
+        return indptr, self.attributes[attr_name].gather(ids, tid)
+
+    def _group_ids(self, name: str) -> np.ndarray:
+        # the interned ids of the members of a group, in iteration order of the group
+        if self.backend == "csr":
+            return self.named_sets.group_ids(name)
+        return self._interner.intern(self.named_sets[name])
 
-    ############################## Grroup methods ##########################################
     def get_group(self, gid: str) -> set:
         """
         retrieve a group by id
@@ -308,15 +542,52 @@ class LifeCycle(object):
 
         """
 
-        if max_size is None:
-            max_size = len(self.universe_set())
-
-        for name, set_ in self.named_sets.copy().items():
-            if len(set_) < min_size or len(set_) > max_size:
+        if self.backend == "csr":
+            sizes = self.named_sets.group_sizes()
+        else:
+            sizes = ((name, len(set_)) for name, set_ in self.named_sets.items())
+
+        to_remove = [
+            name
+            for name, size in sizes
+            if size < min_size or (max_size is not None and size > max_size)
+        ]
+        if self._memberships is not None:
+            for name in to_remove:
+                for element in self.named_sets[name]:
+                    names = self._memberships[element]
+                    names.remove(name)
+                    if len(names) == 0:
+                        del self._memberships[element]
+
+        if self.backend == "csr":
+            self.named_sets.drop(to_remove)
+        else:
+            for name in to_remove:
                 del self.named_sets[name]
-                self.tid_to_named_sets[name.split("_")[0]].remove(name)
+
+        self._invalidate_flows({int(name.split("_")[0]) for name in to_remove})
+
+        removed = set(to_remove)
+        for tid in {name.split("_")[0] for name in to_remove}:
+            self.tid_to_named_sets[tid] = [
+                name for name in self.tid_to_named_sets[tid] if name not in removed
+            ]
 
     ############################## Element-centric methods ##########################################
+    def _membership_index(self) -> dict:
+        """
+        retrieve the inverted index mapping each element to the (ordered) names of the groups that contain it.
+        The index is built in one pass on first use and then kept up to date by add_partition,
+        filter_on_group_size and slice.
+        """
+        if self._memberships is None:
+            self._memberships = defaultdict(list)
+            for name, set_ in self.named_sets.items():
+                for element in set_:
+                    self._memberships[element].append(name)
+        return self._memberships
+
     def get_element_membership(self, element: object) -> list:
         """
         retrieve the list of groups that contain a given element
@@ -332,12 +603,10 @@ class LifeCycle(object):
         >>> # ['0_0', '1_0']
 
         """
-
-        memberships = list()
-        for name, set_ in self.named_sets.items():
-            if element in set_:
-                memberships.append(name)
-        return memberships
+        index = self._membership_index()
+        if element not in index:
+            return list()
+        return list(index[element])
 
     def get_all_element_memberships(self) -> dict:
         """
@@ -351,18 +620,71 @@ class LifeCycle(object):
         >>> lc.add_partition([[1,2,3], [4,5]])
         >>> lc.get_all_element_memberships()
         """
+        index = self._membership_index()
 
         memberships = defaultdict(list)
-
         for element in self.universe_set():
-            for name, set_ in self.named_sets.items():
-                if element in set_:
-                    memberships[element].append(name)
+            memberships[element] = list(index[element])
 
         return memberships
 
     ############################## Flow methods ##########################################
-    def group_flow(self, target: str, direction: str, min_branch_size: int = 1) -> dict:
+    def _invalidate_flows(self, tids) -> None:
+        """
+        discard the cached flow matrices involving the given temporal ids, and mark their partitions as changed
+        """
+        tids = set(tids)
+        for tid in tids:
+            self._versions[tid] += 1
+        for key in list(self._flows):
+            if key[0] in tids or key[1] in tids:
+                del self._flows[key]
+
+    @instrumented("LifeCycle.get_flow_matrix", lambda res, *a, **k: res.counts.nnz)
+    def get_flow_matrix(self, tid: int, direction: str) -> FlowMatrix:
+        """
+        compute the flow between the partition observed at tid and the adjacent one in the given temporal direction,
+        as a sparse contingency matrix of overlap counts. The matrix is computed in one pass over the memberships of the
+        two partitions and cached: the backward matrix of tid + 1 is the transpose of the forward matrix of tid.
+
+        :param tid: the temporal id of the source partition
+        :param direction: the temporal direction of the flow
+        :return: a FlowMatrix whose entry (i, j) is the overlap between the i-th group at tid and the j-th group of the
+            reference partition
+
+        :Example:
+        >>> lc = LifeCycle()
+        >>> lc.add_partition([[1,2], [3,4,5]])
+        >>> lc.add_partition([[1,2,3], [4,5]])
+        >>> lc.get_flow_matrix(0, "+").counts.toarray()
+        array([[2, 0],
+               [1, 2]], dtype=int32)
+        """
+        if direction == "+":
+            ref_tid = tid + 1
+        elif direction == "-":
+            ref_tid = tid - 1
+        else:
+            raise ValueError("direction must either be + or -")
+
+        key = (tid, ref_tid)
+        if key not in self._flows:
+            if (ref_tid, tid) in self._flows:
+                self._flows[key] = self._flows[(ref_tid, tid)].transpose()
+            else:
+                self._flows[key] = FlowMatrix.from_partitions(
+                    self.get_partition_csr(tid), self.get_partition_csr(ref_tid)
+                )
+        return self._flows[key]
+
+    @instrumented("LifeCycle.group_flow", lambda res, *a, **k: len(res))
+    def group_flow(
+        self,
+        target: str,
+        direction: str,
+        min_branch_size: int = 1,
+        counts_only: bool = False,
+    ) -> dict:
         """
         compute the flow of a group w.r.t. a given temporal direction. The flow of a group is the collection of groups that
         contain at least one element of the target group, Returns a dictionary keyed by group name and valued by the
@@ -371,6 +693,7 @@ class LifeCycle(object):
         :param target: the name of the group to analyze
         :param direction: the temporal direction in which the group is to be analyzed
         :param min_branch_size: the minimum size of the intersection between the target group and the group corresponding
+        :param counts_only: if True, the flow is valued by the size of the intersections instead of the intersections
         :return: a dictionary keyed by group name and valued by the intersection of the target group and the group
 
         :Example:
@@ -379,32 +702,55 @@ class LifeCycle(object):
         >>> lc.add_partition([[1,2,3], [4,5]])
         >>> lc.group_flow("0_0", "+")
         >>> # {'1_0': {1, 2}}
+        >>> lc.group_flow("0_1", "+", counts_only=True)
+        >>> # {'1_0': 1, '1_1': 2}
 
         """
         flow = dict()
-        tid = int(target.split("_")[0])
-        if direction == "+":
-            ref_tid = tid + 1
-        elif direction == "-":
-            ref_tid = tid - 1
-        else:
-            raise ValueError("direction must either be + or -")
-        reference = self.get_partition_at(ref_tid)
-        target_set = self.get_group(target)
-
-        for name in reference:
-            set_ = self.get_group(name)
-            branch = target_set.intersection(set_)
-            if len(branch) >= min_branch_size:
-                flow[name] = branch
+        tid, gid = [int(i) for i in target.split("_")]
+        flow_matrix = self.get_flow_matrix(tid, direction)
+        source, reference = flow_matrix.source, flow_matrix.reference
+
+        row = source.row(gid)
+        if row < 0:
+            return flow
+        cols, counts = flow_matrix.row(row)
+        if min_branch_size < 1:  # empty branches are part of the flow too
+            dense = np.zeros(len(reference), dtype=counts.dtype)
+            dense[cols] = counts
+            cols, counts = np.arange(len(reference)), dense
+
+        prefix = str(reference.tid) + "_"
+        target_set = None
+        for col, count in zip(cols.tolist(), counts.tolist()):
+            if count < min_branch_size:
+                continue
+            name = prefix + str(reference.gids[col])
+            if counts_only:
+                flow[name] = count
+            elif self.backend == "csr":
+                branch = np.intersect1d(
+                    source.group(row), reference.group(col), assume_unique=True
+                )
+                flow[name] = set(self._interner.decode(branch))
+            else:
+                if target_set is None:
+                    target_set = self.get_group(target)
+                flow[name] = target_set.intersection(self.get_group(name))
         return flow
 
-    def all_flows(self, direction: str, min_branch_size: int = 1) -> dict:
+    @instrumented("LifeCycle.all_flows", lambda res, *a, **k: len(res))
+    def all_flows(
+        self, direction: str, min_branch_size: int = 1, counts_only: bool = False
+    ) -> dict:
         """
-        compute the flow of all groups w.r.t. a given temporal direction
+        compute the flow of all groups w.r.t. a given temporal direction.
+        Flows are derived from one sparse contingency matrix per pair of adjacent partitions (see get_flow_matrix), so
+        only the pairs of groups that actually overlap are intersected.
 
         :param direction: the temporal direction in which the groups are to be analyzed
         :param min_branch_size: the minimum size of a branch to be considered
+        :param counts_only: if True, flows are valued by the size of the intersections instead of the intersections
         :return: a dictionary keyed by group name and valued by the flow of the group
 
         :Example:
@@ -413,12 +759,17 @@ class LifeCycle(object):
         >>> lc.add_partition([[1,2,3], [4,5]])
         >>> lc.all_flows("+")
         >>> # {'0_0': {'1_0': {1, 2}}, '0_1': {'1_0': {3}, '1_1': {4, 5}}}
+        >>> lc.all_flows("+", counts_only=True)
+        >>> # {'0_0': {'1_0': 2}, '0_1': {'1_0': 1, '1_1': 2}}
 
         """
         all_flows = dict()
         for name in self.named_sets:
             all_flows[name] = self.group_flow(
-                name, direction, min_branch_size=min_branch_size
+                name,
+                direction,
+                min_branch_size=min_branch_size,
+                counts_only=counts_only,
             )
 
         return all_flows
@@ -441,7 +792,7 @@ class LifeCycle(object):
 
         dic = dict()
         for k, v in self.to_dict().items():
-            if isinstance(v, dict):
+            if isinstance(v, Mapping):
                 v = {k_: list(v_) for k_, v_ in v.items()}
             dic[k] = v
 
@@ -458,7 +809,8 @@ class LifeCycle(object):
         :return: None
 
         :Example:
-        >>> lc = LifeCycle().read_json('lc.json')
+        >>> lc = LifeCycle()
+        >>> lc.read_json('lc.json')
 
         """
 
@@ -476,14 +828,191 @@ class LifeCycle(object):
             ds = json.loads(f.read())
 
         self.dtype = known_types[ds["dtype"]]
+        self._clear()
+        groups = defaultdict(dict)  # tid -> gid -> group
         for name, set_ in ds["named_sets"].items():
-            self.named_sets[name] = set(set_)
-            self.tid_to_named_sets[int(name.split("_")[0])] = name
+            tid, gid = name.split("_")
+            groups[int(tid)][int(gid)] = set_
+
+        for tid in sorted(groups):
+            gids = sorted(groups[tid])
+            self.tids.append(tid)
+            self.tid_to_named_sets[str(tid)] = [f"{tid}_{gid}" for gid in gids]
+            if self.backend == "csr":
+                self.named_sets.partitions[tid] = CSRPartition.from_groups(
+                    tid,
+                    gids,
+                    [
+                        np.unique(self._interner.intern(groups[tid][gid]))
+                        for gid in gids
+                    ],
+                )
+            else:
+                for gid in gids:
+                    self.named_sets[f"{tid}_{gid}"] = set(groups[tid][gid])
 
-        self.tids = [int(i) for i in self.tid_to_named_sets.keys()]
-        self.named_sets = {k: set(v) for k, v in ds["named_sets"].items()}
+        self._invalidate_flows(self.tids)
         print("Loaded LifeCycle from", path)
 
+    def write_binary(self, path: str) -> None:
+        """
+        save the LifeCycle to a directory of numpy (.npy) arrays that read_binary can memory-map.
+        Groups are stored in compressed sparse row form over dense element ids, along with the element dictionary
+        (elements positioned by id) and the categorical codes of each attribute. Elements must all be of the same
+        int, float or str type, and attribute values must be json serializable.
+        Arrays are filled one partition at a time rather than concatenated in memory.
+
+        :param path: the path to the directory, created if needed. Existing files of a previous save are replaced,
+            so a LifeCycle read with read_binary can be written back to its own directory
+        :return: None
+
+        :Example:
+        >>> lc = LifeCycle()
+        >>> lc.add_partition([[1,2], [3,4,5]])
+        >>> lc.add_partition([[1,2,3], [4,5]])
+        >>> lc.write_binary("lc")
+
+        """
+        # building the partitions interns all the elements
+        partitions = [self.get_partition_csr(tid) for tid in self.tids]
+        elements = self._interner.elements()
+        if len({type(element) for element in elements}) > 1:
+            raise TypeError("elements must all be of the same type")
+        elements = np.asarray(elements)
+        if elements.dtype.kind not in "biufU":
+            raise TypeError("elements must all be of the same int, float or str type")
+
+        attributes = {
+            attr_name: {"file": f"attribute_{i}.npy", "categories": attr.categories}
+            for i, (attr_name, attr) in enumerate(self.attributes.items())
+        }
+        # serialize the header first, to fail on non serializable attribute values before writing anything
+        header = json.dumps(
+            {
+                "format": "lifecycles",
+                "version": 1,
+                "dtype": self.to_dict()["dtype"],
+                "tids": list(self.tids),
+                "attributes": attributes,
+            },
+            indent=2,
+        )
+
+        # arrays are written to temporary files, then moved in place: the files of a previous save of the same
+        # directory may still be mapped, e.g., by this very LifeCycle if it was loaded from there
+        os.makedirs(path, exist_ok=True)
+
+        def temporary(name: str) -> str:
+            return os.path.join(path, "." + name)
+
+        def replace(name: str) -> None:
+            os.replace(temporary(name), os.path.join(path, name))
+
+        n_groups = sum(len(p) for p in partitions)
+        offsets = np.zeros(len(partitions) + 1, dtype=np.int64)
+        np.cumsum([len(p) for p in partitions], out=offsets[1:])
+        gids = np.lib.format.open_memmap(
+            temporary("gids.npy"), mode="w+", dtype=np.int64, shape=(n_groups,)
+        )
+        indptr = np.lib.format.open_memmap(
+            temporary("indptr.npy"), mode="w+", dtype=np.int64, shape=(n_groups + 1,)
+        )
+        indices = np.lib.format.open_memmap(
+            temporary("indices.npy"),
+            mode="w+",
+            dtype=np.int32,
+            shape=(sum(len(p.indices) for p in partitions),),
+        )
+        indptr[0] = 0
+        for i, partition in enumerate(partitions):
+            start, end = offsets[i], offsets[i + 1]
+            first = indptr[start]
+            gids[start:end] = partition.gids
+            indptr[start + 1 : end + 1] = first + partition.indptr[1:]
+            indices[first : first + len(partition.indices)] = partition.indices
+        for array in (gids, indptr, indices):
+            array.flush()
+        del gids, indptr, indices
+
+        np.save(temporary("offsets.npy"), offsets)
+        np.save(temporary("elements.npy"), elements)
+        for attr_name, attr in self.attributes.items():
+            np.save(temporary(attributes[attr_name]["file"]), attr.codes)
+        names = ["gids.npy", "indptr.npy", "indices.npy", "offsets.npy", "elements.npy"]
+        for name in names + [attr["file"] for attr in attributes.values()]:
+            replace(name)
+
+        with open(os.path.join(path, "lifecycle.json"), "wt") as f:
+            f.write(header)
+
+    def read_binary(self, path: str, mmap: bool = True) -> None:
+        """
+        load the LifeCycle from a directory written by write_binary, replacing its content.
+        By default the arrays are memory-mapped rather than read: opening a lifecycle is nearly instant whatever its
+        size, and groups are sliced out of the mapped arrays (without copying them) on first access. The LifeCycle
+        switches to the "csr" backend; the dtype declared at instantiation is overwritten by the saved one.
+        Attribute codes are mapped copy-on-write, so updating attributes never modifies the files.
+
+        :param path: the path to the directory
+        :param mmap: if True (default), memory-map the arrays. Otherwise, read them into memory
+        :return: None
+
+        :Example:
+        >>> lc = LifeCycle()
+        >>> lc.read_binary("lc")
+        >>> lc.get_group("1_0") # only the members of this group are read from disk
+        >>> # {1, 2, 3}
+
+        """
+        known_types = {
+            "int": int,
+            "float": float,
+            "str": str,
+            "list": list,
+            "dict": dict,
+        }
+
+        with open(os.path.join(path, "lifecycle.json"), "rt") as f:
+            header = json.loads(f.read())
+        if header.get("format") != "lifecycles":
+            raise ValueError(f"{path} does not contain a LifeCycle")
+
+        def load(name: str, mode: str = "r") -> np.ndarray:
+            return np.load(os.path.join(path, name), mmap_mode=mode if mmap else None)
+
+        self.dtype = known_types[header["dtype"]]
+        self.backend = "csr"
+        self._clear(MappedInterner(load("elements.npy")))
+
+        tids = header["tids"]
+        offsets = np.load(os.path.join(path, "offsets.npy"))
+        gids = load("gids.npy")
+        self.tids = list(tids)
+        self.named_sets = CSRGroupStore(
+            self._interner,
+            LazyPartitions(
+                tids, offsets, gids, load("indptr.npy"), load("indices.npy")
+            ),
+        )
+        for i, tid in enumerate(tids):
+            prefix = str(tid) + "_"
+            self.tid_to_named_sets[str(tid)] = [
+                prefix + str(gid) for gid in gids[offsets[i] : offsets[i + 1]].tolist()
+            ]
+
+        for attr_name, saved in header["attributes"].items():
+            attr = CategoricalAttribute()
+            # json turns tuples into lists, which are not hashable
+            attr.categories = [
+                tuple(value) if isinstance(value, list) else value
+                for value in saved["categories"]
+            ]
+            attr._index = {value: code for code, value in enumerate(attr.categories)}
+            attr.codes = load(saved["file"], "c")
+            self.attributes[attr_name] = attr
+
+        self._invalidate_flows(self.tids)
+
     def to_dict(self) -> dict:
         """
         convert the LifeCycle to a dictionary
@@ -0,0 +1,125 @@
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from lifecycles.classes.storage import CSRPartition
+
+if TYPE_CHECKING:
+    import scipy.sparse as sp
+
+__all__ = ["FlowMatrix", "incidence_matrix", "contingency_matrix"]
+
+
+def incidence_matrix(partition: CSRPartition, n_elements: int) -> "sp.csr_matrix":
+    """
+    build the (groups x elements) binary incidence matrix of a partition, sharing its CSR arrays
+
+    :param partition: a CSRPartition
+    :param n_elements: the number of columns (i.e., interned elements) of the matrix
+    :return: a scipy.sparse csr_matrix
+    """
+    # scipy is imported on first use, to keep importing lifecycles cheap
+    import scipy.sparse as sp
+
+    data = np.ones(len(partition.indices), dtype=np.int32)
+    return sp.csr_matrix(
+        (data, partition.indices, partition.indptr),
+        shape=(len(partition), n_elements),
+    )
+
+
+def _n_elements(*partitions) -> int:
+    return max(p.indices.max(initial=-1) for p in partitions) + 1
+
+
+def contingency_matrix(
+    source: CSRPartition, reference: CSRPartition
+) -> "sp.csr_matrix":
+    """
+    compute the overlap counts between the groups of two partitions.
+    Entry (i, j) is the number of elements shared by the i-th source group and the j-th reference group;
+    pairs of groups that share no element are not stored.
+
+    :param source: a CSRPartition
+    :param reference: a CSRPartition whose ids come from the same ElementInterner
+    :return: a (len(source) x len(reference)) scipy.sparse csr_matrix with sorted indices
+    """
+    n_elements = _n_elements(source, reference)
+    a = incidence_matrix(source, n_elements)
+    b = incidence_matrix(reference, n_elements)
+    counts = (a @ b.T).tocsr()
+    counts.eliminate_zeros()
+    counts.sort_indices()
+    return counts
+
+
+class FlowMatrix(object):
+    """
+    The flow between two partitions, stored as a sparse contingency matrix of overlap counts.
+    Rows follow the groups of the source partition, columns those of the reference partition.
+
+    :param source: the CSRPartition whose groups are the targets of the flow
+    :param reference: the CSRPartition the flow is directed to
+    :param counts: the (len(source) x len(reference)) contingency matrix
+    """
+
+    __slots__ = ["source", "reference", "counts"]
+
+    def __init__(
+        self, source: CSRPartition, reference: CSRPartition, counts: "sp.csr_matrix"
+    ) -> None:
+        self.source = source
+        self.reference = reference
+        self.counts = counts
+
+    @classmethod
+    def from_partitions(
+        cls, source: CSRPartition, reference: CSRPartition
+    ) -> "FlowMatrix":
+        """
+        compute the flow between two partitions
+
+        :param source: a CSRPartition
+        :param reference: a CSRPartition
+        :return: a FlowMatrix
+        """
+        return cls(source, reference, contingency_matrix(source, reference))
+
+    def transpose(self) -> "FlowMatrix":
+        """
+        retrieve the flow in the opposite temporal direction
+
+        :return: a FlowMatrix whose source is the reference of this one
+        """
+        counts = self.counts.T.tocsr()
+        counts.sort_indices()
+        return FlowMatrix(self.reference, self.source, counts)
+
+    def row(self, row: int) -> tuple:
+        """
+        retrieve the branches of a source group
+
+        :param row: the row of the source group
+        :return: a tuple (columns of the reference groups, overlap counts)
+        """
+        start, end = self.counts.indptr[row], self.counts.indptr[row + 1]
+        return self.counts.indices[start:end], self.counts.data[start:end]
+
+    def covered(self, min_branch_size: int = 1) -> np.ndarray:
+        """
+        count, for each source group, the elements that belong to at least one of its branches.
+        When the reference groups are disjoint this is just the sum of the branch sizes.
+
+        :param min_branch_size: the minimum overlap for a reference group to be considered a branch
+        :return: an array with one count per source group
+        """
+        branches = self.counts.multiply(self.counts >= max(min_branch_size, 1))
+        if self.reference.is_disjoint():
+            return np.asarray(branches.sum(axis=1)).ravel()
+
+        n_elements = _n_elements(self.source, self.reference)
+        reached = (branches > 0).astype(np.int32) @ incidence_matrix(
+            self.reference, n_elements
+        )
+        covered = reached.multiply(incidence_matrix(self.source, n_elements)) > 0
+        return np.asarray(covered.sum(axis=1)).ravel()
@@ -0,0 +1,481 @@
+from collections.abc import Mapping, MutableMapping
+from itertools import islice
+
+import numpy as np
+
+__all__ = [
+    "ElementInterner",
+    "MappedInterner",
+    "CSRPartition",
+    "CSRGroupStore",
+    "LazyPartitions",
+]
+
+
+class ElementInterner(object):
+    """
+    A bidirectional mapping between the elements of a LifeCycle and dense int32 ids.
+    Ids are assigned in order of first appearance and never change.
+
+    :Example:
+    >>> interner = ElementInterner()
+    >>> interner.intern(["a", "b", "a"])
+    array([0, 1, 0], dtype=int32)
+    >>> interner.decode([1, 0])
+    ['b', 'a']
+    """
+
+    def __init__(self) -> None:
+        self._ids = dict()
+        self._elements = list()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def intern(self, elements) -> np.ndarray:
+        """
+        retrieve the ids of the given elements, assigning new ids to unseen elements
+
+        :param elements: an iterable of elements
+        :return: an int32 array of ids
+        """
+        ids = self._ids
+        return np.fromiter(
+            (ids.setdefault(elem, len(ids)) for elem in elements), dtype=np.int32
+        )
+
+    def lookup(self, element: object) -> int:
+        """
+        retrieve the id of an element without interning it
+
+        :param element: the element
+        :return: the id of the element, -1 if the element is unknown
+        """
+        return self._ids.get(element, -1)
+
+    def elements(self) -> list:
+        """
+        retrieve the interned elements, positioned by id
+
+        :return: a list of elements
+        """
+        if len(self._elements) < len(self._ids):
+            self._elements.extend(islice(self._ids, len(self._elements), None))
+        return self._elements
+
+    def decode(self, ids) -> list:
+        """
+        retrieve the elements corresponding to the given ids
+
+        :param ids: an iterable of ids
+        :return: a list of elements
+        """
+        elements = self.elements()
+        if isinstance(ids, np.ndarray):
+            ids = ids.tolist()
+        return [elements[i] for i in ids]
+
+
+class MappedInterner(ElementInterner):
+    """
+    An ElementInterner backed by an array of elements positioned by id, e.g., a memory-mapped one.
+    Ids are decoded by indexing the array; the element -> id dictionary is only built when an element is looked up or
+    interned.
+
+    :param elements: an array of elements, positioned by id
+
+    :Example:
+    >>> interner = MappedInterner(np.array(["a", "b"]))
+    >>> interner.decode([1, 0])
+    ['b', 'a']
+    >>> interner.intern(["c", "a"])
+    array([2, 0], dtype=int32)
+    """
+
+    def __init__(self, elements: np.ndarray) -> None:
+        super().__init__()
+        self._array = elements
+        self._loaded = False
+
+    def _load(self) -> None:
+        if not self._loaded:
+            self._elements = self._array.tolist()
+            self._ids = dict(zip(self._elements, range(len(self._elements))))
+            self._loaded = True
+
+    def __len__(self) -> int:
+        return len(self._ids) if self._loaded else len(self._array)
+
+    def intern(self, elements) -> np.ndarray:
+        self._load()
+        return super().intern(elements)
+
+    def lookup(self, element: object) -> int:
+        self._load()
+        return super().lookup(element)
+
+    def elements(self) -> list:
+        self._load()
+        return super().elements()
+
+    def decode(self, ids) -> list:
+        if self._loaded:
+            return super().decode(ids)
+        return self._array[np.asarray(ids, dtype=np.int64)].tolist()
+
+
+class CSRPartition(object):
+    """
+    A partition stored in compressed sparse row (CSR) form.
+    The members of the i-th group are ``indices[indptr[i]:indptr[i + 1]]``, sorted by element id.
+
+    :param tid: the temporal id of the partition
+    :param gids: the group ids (the gid part of 'tid_gid' names), one per group, in increasing order
+    :param indptr: the group offsets (len(gids) + 1 values)
+    :param indices: the interned ids of the group members
+    """
+
+    __slots__ = ["tid", "gids", "indptr", "indices", "_disjoint"]
+
+    def __init__(
+        self, tid: int, gids: np.ndarray, indptr: np.ndarray, indices: np.ndarray
+    ) -> None:
+        self.tid = tid
+        self.gids = gids
+        self.indptr = indptr
+        self.indices = indices
+        self._disjoint = None
+
+    @classmethod
+    def from_groups(cls, tid: int, gids: list, groups: list) -> "CSRPartition":
+        """
+        build a partition from a list of arrays of (unique) interned ids
+
+        :param tid: the temporal id of the partition
+        :param gids: the group ids
+        :param groups: a list of int32 arrays, one per group
+        :return: a CSRPartition
+        """
+        sizes = np.fromiter((len(g) for g in groups), dtype=np.int64, count=len(groups))
+        indptr = np.zeros(len(groups) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=indptr[1:])
+        if len(groups) > 0:
+            members = np.concatenate(groups).astype(np.int32, copy=False)
+        else:
+            members = np.empty(0, dtype=np.int32)
+        rows = np.repeat(np.arange(len(groups)), sizes)
+        members = members[np.lexsort((members, rows))]
+        return cls(tid, np.asarray(gids, dtype=np.int64), indptr, members)
+
+    @classmethod
+    def empty(cls, tid: int) -> "CSRPartition":
+        """
+        build a partition with no groups
+
+        :param tid: the temporal id of the partition
+        :return: an empty CSRPartition
+        """
+        return cls(
+            tid,
+            np.empty(0, dtype=np.int64),
+            np.zeros(1, dtype=np.int64),
+            np.empty(0, dtype=np.int32),
+        )
+
+    def __len__(self) -> int:
+        return len(self.gids)
+
+    def names(self) -> list:
+        """
+        retrieve the names of the groups, in row order
+
+        :return: a list of 'tid_gid' names
+        """
+        prefix = str(self.tid) + "_"
+        return [prefix + str(gid) for gid in self.gids.tolist()]
+
+    def sizes(self) -> np.ndarray:
+        """
+        retrieve the size of each group
+
+        :return: an array of group sizes
+        """
+        return np.diff(self.indptr)
+
+    def row(self, gid: int) -> int:
+        """
+        retrieve the row of a group
+
+        :param gid: the group id
+        :return: the row of the group, -1 if the group is not in the partition
+        """
+        row = int(np.searchsorted(self.gids, gid))
+        if row < len(self.gids) and self.gids[row] == gid:
+            return row
+        return -1
+
+    def group(self, row: int) -> np.ndarray:
+        """
+        retrieve the interned ids of a group (a view, not a copy)
+
+        :param row: the row of the group
+        :return: an array of ids
+        """
+        return self.indices[self.indptr[row] : self.indptr[row + 1]]
+
+    def row_ids(self) -> np.ndarray:
+        """
+        retrieve the row of each membership, i.e., the group each entry of indices belongs to
+
+        :return: an array of rows, aligned with indices
+        """
+        return np.repeat(np.arange(len(self.gids)), self.sizes())
+
+    def is_disjoint(self) -> bool:
+        """
+        check whether no element belongs to more than one group
+
+        :return: True if the groups are pairwise disjoint
+        """
+        if self._disjoint is None:
+            self._disjoint = len(np.unique(self.indices)) == len(self.indices)
+        return self._disjoint
+
+    def drop(self, rows) -> "CSRPartition":
+        """
+        remove some groups from the partition
+
+        :param rows: the rows of the groups to remove
+        :return: a new CSRPartition
+        """
+        keep = np.ones(len(self.gids), dtype=bool)
+        keep[np.asarray(rows, dtype=np.int64)] = False
+        sizes = self.sizes()[keep]
+        indptr = np.zeros(len(sizes) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=indptr[1:])
+        return CSRPartition(
+            self.tid, self.gids[keep], indptr, self.indices[keep[self.row_ids()]]
+        )
+
+
+class LazyPartitions(MutableMapping):
+    """
+    A mapping from temporal ids to CSRPartitions sliced, on first access, out of arrays concatenating all the
+    partitions (e.g., memory-mapped ones). Partitions are views on the arrays, except for their offsets.
+
+    :param tids: the temporal ids, in storage order
+    :param offsets: the rows of the first group of each partition (len(tids) + 1 values)
+    :param gids: the group ids of all the groups
+    :param indptr: the offsets of all the groups in indices (len(gids) + 1 values)
+    :param indices: the interned ids of the members of all the groups
+    """
+
+    def __init__(
+        self,
+        tids: list,
+        offsets: np.ndarray,
+        gids: np.ndarray,
+        indptr: np.ndarray,
+        indices: np.ndarray,
+    ) -> None:
+        self._rows = {tid: i for i, tid in enumerate(tids)}
+        self._offsets = offsets
+        self._gids = gids
+        self._indptr = indptr
+        self._indices = indices
+        self._partitions = dict()  # tid -> CSRPartition, sliced or set
+        self._tids = list(tids)
+
+    def _slice(self, tid: int) -> CSRPartition:
+        i = self._rows[tid]
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        indptr = np.asarray(self._indptr[start : end + 1], dtype=np.int64)
+        first = int(indptr[0])
+        return CSRPartition(
+            tid,
+            self._gids[start:end],
+            indptr - first,
+            self._indices[first : int(indptr[-1])],
+        )
+
+    def __getitem__(self, tid: int) -> CSRPartition:
+        partition = self._partitions.get(tid)
+        if partition is None:
+            if tid not in self._rows:
+                raise KeyError(tid)
+            partition = self._partitions[tid] = self._slice(tid)
+        return partition
+
+    def __setitem__(self, tid: int, partition: CSRPartition) -> None:
+        if tid not in self._partitions and tid not in self._rows:
+            self._tids.append(tid)
+        self._partitions[tid] = partition
+
+    def __delitem__(self, tid: int) -> None:
+        if tid not in self._partitions and tid not in self._rows:
+            raise KeyError(tid)
+        self._partitions.pop(tid, None)
+        self._rows.pop(tid, None)
+        self._tids.remove(tid)
+
+    def __iter__(self):
+        return iter(self._tids)
+
+    def __len__(self) -> int:
+        return len(self._tids)
+
+    def __contains__(self, tid: object) -> bool:
+        return tid in self._partitions or tid in self._rows
+
+
+class CSRGroupStore(MutableMapping):
+    """
+    A mapping from group names ('tid_gid') to groups backed by one CSRPartition per temporal id.
+    Groups are decoded into sets on access; they are stored as arrays of interned ids.
+
+    :param interner: the ElementInterner shared with the owning LifeCycle
+    :param partitions: a mapping from temporal ids to CSRPartitions, e.g., a LazyPartitions. Defaults to an empty dict
+    """
+
+    def __init__(self, interner: ElementInterner, partitions: Mapping = None) -> None:
+        self.interner = interner
+        self.partitions = dict() if partitions is None else partitions
+
+    @staticmethod
+    def _split_name(name: str) -> tuple:
+        tid, gid = name.split("_")
+        return int(tid), int(gid)
+
+    def _locate(self, name: str) -> tuple:
+        try:
+            tid, gid = self._split_name(name)
+        except (AttributeError, ValueError):
+            raise KeyError(name)
+        partition = self.partitions.get(tid)
+        row = -1 if partition is None else partition.row(gid)
+        if row < 0:
+            raise KeyError(name)
+        return partition, row
+
+    def add_partition(self, tid: int, groups: list) -> None:
+        """
+        store a partition, replacing any partition with the same temporal id
+
+        :param tid: the temporal id of the partition
+        :param groups: a list of groups (iterables of elements)
+        :return: None
+        """
+        self.partitions[tid] = CSRPartition.from_groups(
+            tid,
+            list(range(len(groups))),
+            [self.interner.intern(group) for group in groups],
+        )
+
+    def partition(self, tid: int) -> CSRPartition:
+        """
+        retrieve a partition by temporal id
+
+        :param tid: the temporal id
+        :return: the CSRPartition (empty if no partition is stored at tid)
+        """
+        partition = self.partitions.get(tid)
+        if partition is None:
+            return CSRPartition.empty(tid)
+        return partition
+
+    def subset(self, tids: list) -> "CSRGroupStore":
+        """
+        retrieve a store restricted to the given temporal ids. Partitions are shared, not copied.
+
+        :param tids: the temporal ids to keep
+        :return: a new CSRGroupStore
+        """
+        store = CSRGroupStore(self.interner)
+        store.partitions = {
+            tid: partition for tid, partition in self.partitions.items() if tid in tids
+        }
+        return store
+
+    def drop(self, names: list) -> None:
+        """
+        remove several groups at once, rebuilding each affected partition only once
+
+        :param names: the names of the groups to remove
+        :return: None
+        """
+        rows = dict()
+        for name in names:
+            partition, row = self._locate(name)
+            rows.setdefault(partition.tid, []).append(row)
+        for tid, to_drop in rows.items():
+            self.partitions[tid] = self.partitions[tid].drop(to_drop)
+
+    def group_ids(self, name: str) -> np.ndarray:
+        """
+        retrieve the interned ids of a group
+
+        :param name: the name of the group
+        :return: an array of ids
+        """
+        partition, row = self._locate(name)
+        return partition.group(row)
+
+    def group_sizes(self):
+        """
+        iterate over (name, size) pairs of all groups
+
+        :return: an iterator of tuples
+        """
+        for partition in self.partitions.values():
+            yield from zip(partition.names(), partition.sizes().tolist())
+
+    def universe_ids(self) -> np.ndarray:
+        """
+        retrieve the ids of all elements belonging to at least one group
+
+        :return: an array of ids
+        """
+        if len(self.partitions) == 0:
+            return np.empty(0, dtype=np.int32)
+        return np.unique(np.concatenate([p.indices for p in self.partitions.values()]))
+
+    def __getitem__(self, name: str) -> set:
+        return set(self.interner.decode(self.group_ids(name)))
+
+    def __setitem__(self, name: str, group) -> None:
+        tid, gid = self._split_name(name)
+        partition = self.partition(tid)
+        gids = partition.gids.tolist()
+        groups = [partition.group(row) for row in range(len(gids))]
+        ids = np.unique(self.interner.intern(group))
+        row = partition.row(gid)
+        if row >= 0:
+            groups[row] = ids
+        else:
+            row = int(np.searchsorted(partition.gids, gid))
+            gids.insert(row, gid)
+            groups.insert(row, ids)
+        self.partitions[tid] = CSRPartition.from_groups(tid, gids, groups)
+
+    def __delitem__(self, name: str) -> None:
+        self.drop([name])
+
+    def __iter__(self):
+        for partition in self.partitions.values():
+            yield from partition.names()
+
+    def __len__(self) -> int:
+        return sum(len(p) for p in self.partitions.values())
+
+    def __contains__(self, name: object) -> bool:
+        try:
+            self._locate(name)
+        except KeyError:
+            return False
+        return True
+
+    def __repr__(self) -> str:
+        return "CSRGroupStore(groups=%d, memberships=%d)" % (
+            len(self),
+            sum(len(p.indices) for p in self.partitions.values()),
+        )
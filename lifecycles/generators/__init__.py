@@ -0,0 +1 @@
+from lifecycles.generators.generators import *
@@ -0,0 +1,341 @@
+import numpy as np
+
+from lifecycles.classes.classes import LifeCycle
+
+__all__ = [
+    "random_partitions",
+    "random_lifecycle",
+    "planted_event_partitions",
+    "planted_event_lifecycle",
+]
+
+PLANTED_EVENTS = ["continuation", "growth", "split", "merge", "death"]
+
+
+def _labels_to_partition(elements: np.ndarray, labels: np.ndarray) -> list:
+    """
+    Group the elements by label, without Python-level loops over the elements.
+    Return the non-empty groups, as lists, in increasing order of label.
+    """
+    order = np.argsort(labels, kind="stable")
+    labels, elements = labels[order], elements[order]
+    bounds = np.flatnonzero(np.diff(labels)) + 1
+    return [group.tolist() for group in np.split(elements, bounds) if len(group) > 0]
+
+
+def random_partitions(
+    n_elements: int = 1000,
+    n_groups: int = 10,
+    n_steps: int = 10,
+    churn: float = 0.1,
+    overlap: float = 0.0,
+    seed=None,
+) -> list:
+    """
+    generate a sequence of random partitions of the integers 0, ..., n_elements - 1.
+    At the first time step each element joins one of n_groups groups uniformly at random; at each of the following
+    steps a fraction churn of the elements moves to another random group, while the others stay in the group they
+    were in. With overlap > 0, a fraction overlap of the elements (drawn anew at each step) also joins a second
+    random group, so that groups overlap.
+
+    :param n_elements: the number of elements
+    :param n_groups: the number of groups per time step (empty groups are dropped)
+    :param n_steps: the number of time steps
+    :param churn: the fraction of elements changing group at each time step
+    :param overlap: the fraction of elements belonging to two groups at each time step
+    :param seed: the seed of the random draws: an int, a numpy SeedSequence or a numpy Generator
+    :return: a list of partitions, each a list of groups (lists of ints)
+
+    :Example:
+
+    >>> from lifecycles.generators import random_partitions
+    >>> partitions = random_partitions(n_elements=100, n_groups=5, n_steps=3, churn=0.2, seed=42)
+    >>> len(partitions)
+    3
+    """
+    rng = np.random.default_rng(seed)
+    elements = np.arange(n_elements)
+    labels = rng.integers(n_groups, size=n_elements)
+
+    partitions = []
+    for step in range(n_steps):
+        if step > 0:
+            moving = rng.random(n_elements) < churn
+            labels = labels.copy()
+            labels[moving] = rng.integers(n_groups, size=int(moving.sum()))
+
+        step_elements, step_labels = elements, labels
+        if overlap > 0 and n_groups > 1:
+            shared = np.flatnonzero(rng.random(n_elements) < overlap)
+            # a second group, different from the first one
+            second = (
+                labels[shared] + rng.integers(1, n_groups, size=len(shared))
+            ) % n_groups
+            step_elements = np.concatenate([elements, shared])
+            step_labels = np.concatenate([labels, second])
+        partitions.append(_labels_to_partition(step_elements, step_labels))
+    return partitions
+
+
+def random_lifecycle(
+    n_elements: int = 1000,
+    n_groups: int = 10,
+    n_steps: int = 10,
+    churn: float = 0.1,
+    overlap: float = 0.0,
+    n_categories: int = 0,
+    seed=None,
+    backend: str = "sets",
+) -> LifeCycle:
+    """
+    generate a LifeCycle from random partitions (see random_partitions).
+    With n_categories > 0, the elements also get a random categorical attribute, named "attr", at each time step.
+
+    :param n_elements: the number of elements
+    :param n_groups: the number of groups per time step (empty groups are dropped)
+    :param n_steps: the number of time steps
+    :param churn: the fraction of elements changing group at each time step
+    :param overlap: the fraction of elements belonging to two groups at each time step
+    :param n_categories: the number of values of the random attribute. 0 (default) means no attribute
+    :param seed: the seed of the random draws: an int, a numpy SeedSequence or a numpy Generator
+    :param backend: the storage backend of the LifeCycle, either "sets" or "csr"
+    :return: a LifeCycle object
+
+    :Example:
+
+    >>> from lifecycles.generators import random_lifecycle
+    >>> lc = random_lifecycle(n_elements=100, n_groups=5, n_steps=3, n_categories=4, seed=42)
+    >>> lc.temporal_ids()
+    [0, 1, 2]
+    """
+    rng = np.random.default_rng(seed)
+    lc = LifeCycle(int, backend=backend)
+    lc.add_partitions_from(
+        random_partitions(n_elements, n_groups, n_steps, churn, overlap, seed=rng)
+    )
+    _random_attribute(lc, n_elements, n_steps, n_categories, rng)
+    return lc
+
+
+def _random_attribute(lc, n_elements: int, n_steps: int, n_categories: int, rng):
+    # a random categorical attribute, named "attr", for every element at every time step
+    if n_categories > 0:
+        elements = np.tile(np.arange(n_elements), n_steps)
+        tids = np.repeat(np.arange(n_steps), n_elements)
+        values = rng.integers(n_categories, size=n_elements * n_steps)
+        lc.set_attribute_values("attr", elements, tids, values)
+
+
+def _draw_from_pool(pool: np.ndarray, counts: np.ndarray, rng) -> tuple:
+    """
+    Draw disjoint random chunks of the given sizes from a pool of elements, as long as the pool lasts.
+    Return the drawn elements, the chunk of each of them, and the number of elements drawn for each chunk.
+    """
+    pool = rng.permutation(pool)
+    ends = np.minimum(np.cumsum(counts), len(pool))
+    drawn = np.diff(ends, prepend=0)
+    return (
+        pool[: ends[-1] if len(ends) else 0],
+        np.repeat(np.arange(len(counts)), drawn),
+        drawn,
+    )
+
+
+def _planted_step(labels, next_id: int, rates: dict, growth: float, rng) -> tuple:
+    """
+    Apply one step of planted events to the community labels of the elements (-1 for elements in no community).
+    Return the labels at the next step, the next free community id, and the planted events as two dictionaries
+    keyed by community id: the forward events of the current communities and the backward events of the next ones.
+    """
+    n_elements = len(labels)
+    active = labels >= 0
+    sizes = np.bincount(labels[active], minlength=next_id)
+    alive = np.flatnonzero(sizes)
+    probs = np.array([rates[e] for e in PLANTED_EVENTS[1:]], dtype=np.float64)
+    probs = np.concatenate([[1 - probs.sum()], probs])
+    drawn = rng.choice(len(PLANTED_EVENTS), size=len(alive), p=probs)
+    events = [PLANTED_EVENTS[i] for i in drawn.tolist()]
+
+    remap = np.arange(next_id)
+    forward, backward = dict(), dict()
+    splitting, halves, second_ids = [], [], []
+    merging = []
+    for c, event in zip(alive.tolist(), events):
+        if event == "split" and sizes[c] < 2:
+            event = "continuation"
+        if event == "merge":
+            merging.append(c)
+            continue
+        forward[c] = event
+        if event == "death":
+            remap[c] = -1
+        elif event == "split":
+            remap[c] = next_id
+            backward[next_id] = backward[next_id + 1] = "split"
+            splitting.append(c)
+            halves.append(sizes[c] // 2)
+            second_ids.append(next_id + 1)
+            next_id += 2
+        else:
+            backward[c] = event
+    merging = rng.permutation(np.array(merging, dtype=np.int64)).tolist()
+    if len(merging) % 2 == 1:  # nothing left to merge with
+        c = merging.pop()
+        forward[c] = backward[c] = "continuation"
+    for a, b in zip(merging[::2], merging[1::2]):
+        remap[a] = remap[b] = next_id
+        forward[a] = forward[b] = backward[next_id] = "merge"
+        next_id += 1
+
+    new_labels = np.where(active, remap[np.maximum(labels, 0)], -1)
+
+    if len(splitting) > 0:
+        # move a random half of the members of each split community to its second id
+        split_rank = np.full(len(remap), -1)
+        split_rank[splitting] = np.arange(len(splitting))
+        members = np.flatnonzero(active & (split_rank[np.maximum(labels, 0)] >= 0))
+        ranks = split_rank[labels[members]]
+        members = members[np.lexsort((rng.random(len(members)), ranks))]
+        ranks = split_rank[labels[members]]
+        starts = np.searchsorted(ranks, np.arange(len(splitting)))
+        position = np.arange(len(members)) - starts[ranks]
+        second = position >= np.asarray(halves)[ranks]
+        new_labels[members[second]] = np.asarray(second_ids)[ranks[second]]
+
+    # growing and newborn communities draw their new members among the elements in no community
+    growing = [c for c in alive.tolist() if forward.get(c) == "growth"]
+    n_births = rng.poisson(rates["birth"] * max(len(alive), 1))
+    mean_size = sizes[alive].mean() if len(alive) > 0 else max(n_elements // 10, 1)
+    counts = np.concatenate(
+        [
+            np.maximum(np.rint(growth * sizes[growing]), 1),
+            np.maximum(rng.poisson(mean_size, size=n_births), 1),
+        ]
+    ).astype(np.int64)
+    targets = np.concatenate(
+        [np.array(growing, dtype=np.int64), next_id + np.arange(n_births)]
+    )
+    elements, chunks, drawn = _draw_from_pool(np.flatnonzero(~active), counts, rng)
+    new_labels[elements] = targets[chunks]
+    for c, n in zip(growing, drawn[: len(growing)].tolist()):
+        if n == 0:  # the pool ran out
+            forward[c] = backward[c] = "continuation"
+    for c, n in zip(targets[len(growing) :].tolist(), drawn[len(growing) :].tolist()):
+        if n > 0:
+            backward[c] = "birth"
+    return new_labels, next_id + n_births, forward, backward
+
+
+def planted_event_partitions(
+    n_elements: int = 1000,
+    n_groups: int = 10,
+    n_steps: int = 10,
+    rates: dict = None,
+    growth: float = 0.2,
+    active: float = 0.8,
+    seed=None,
+) -> tuple:
+    """
+    generate a sequence of partitions of the integers 0, ..., n_elements - 1 with planted events, along with the
+    ground truth events.
+    At the first time step a fraction active of the elements joins one of n_groups communities uniformly at random,
+    the others belonging to no community. At each of the following steps each community independently continues
+    unchanged, grows, splits in two halves, merges with another community (communities drawing a merge are paired at
+    random), or dies, with the given rates; moreover, a number of new communities drawn from a Poisson distribution
+    with mean rates["birth"] times the number of communities is born. Growing and newborn communities draw their new
+    members among the elements that belonged to no community at the previous step, while the members of dead
+    communities leave all communities.
+    Elements are assigned to communities in vectorized form, so only the communities (not their members) are
+    iterated over in Python.
+
+    :param n_elements: the number of elements
+    :param n_groups: the number of communities at the first time step
+    :param n_steps: the number of time steps
+    :param rates: a dictionary keyed by event ("birth", "death", "merge", "split", "growth") and valued by its rate.
+        Missing events default to 0.1; communities continue unchanged with the remaining probability
+    :param growth: the fraction of its size that a growing community gains
+    :param active: the fraction of the elements belonging to a community at the first time step
+    :param seed: the seed of the random draws: an int, a numpy SeedSequence or a numpy Generator
+    :return: a tuple (partitions, events). partitions is a list of partitions, each a list of groups (lists of ints);
+        events is a dictionary keyed by temporal direction. events["+"] maps each group observed before the last time
+        step to what happens to it next ("continuation", "growth", "split", "merge", or "death"); events["-"] maps
+        each group observed after the first time step to where it comes from ("birth", "continuation", "growth",
+        "split", or "merge")
+
+    :Example:
+
+    >>> from lifecycles.generators import planted_event_partitions
+    >>> partitions, events = planted_event_partitions(1000, 10, 5, rates={"merge": 0.2, "death": 0}, seed=42)
+    >>> events["+"]["0_0"]
+    'merge'
+    """
+    rates = dict({e: 0.1 for e in ["birth"] + PLANTED_EVENTS[1:]}, **(rates or {}))
+    if sum(rates[e] for e in PLANTED_EVENTS[1:]) > 1:
+        raise ValueError(
+            "the rates of growth, split, merge and death must sum to at most 1"
+        )
+
+    rng = np.random.default_rng(seed)
+    elements = np.arange(n_elements)
+    labels = np.where(
+        rng.random(n_elements) < active, rng.integers(n_groups, size=n_elements), -1
+    )
+    next_id = n_groups
+
+    partitions = []
+    events = {"+": dict(), "-": dict()}
+    names = None
+    for tid in range(n_steps):
+        if tid > 0:
+            labels, next_id, forward, backward = _planted_step(
+                labels, next_id, rates, growth, rng
+            )
+            events["+"].update((names[c], event) for c, event in forward.items())
+        ids = np.unique(labels[labels >= 0])
+        names = dict(zip(ids.tolist(), [f"{tid}_{i}" for i in range(len(ids))]))
+        if tid > 0:
+            events["-"].update((names[c], event) for c, event in backward.items())
+        member = labels >= 0
+        partitions.append(_labels_to_partition(elements[member], labels[member]))
+    return partitions, events
+
+
+def planted_event_lifecycle(
+    n_elements: int = 1000,
+    n_groups: int = 10,
+    n_steps: int = 10,
+    rates: dict = None,
+    growth: float = 0.2,
+    active: float = 0.8,
+    n_categories: int = 0,
+    seed=None,
+    backend: str = "sets",
+) -> tuple:
+    """
+    generate a LifeCycle with planted events (see planted_event_partitions), along with the ground truth events.
+    With n_categories > 0, the elements also get a random categorical attribute, named "attr", at each time step.
+
+    :param n_elements: the number of elements
+    :param n_groups: the number of communities at the first time step
+    :param n_steps: the number of time steps
+    :param rates: a dictionary keyed by event ("birth", "death", "merge", "split", "growth") and valued by its rate
+    :param growth: the fraction of its size that a growing community gains
+    :param active: the fraction of the elements belonging to a community at the first time step
+    :param n_categories: the number of values of the random attribute. 0 (default) means no attribute
+    :param seed: the seed of the random draws: an int, a numpy SeedSequence or a numpy Generator
+    :param backend: the storage backend of the LifeCycle, either "sets" or "csr"
+    :return: a tuple (LifeCycle, events), see planted_event_partitions for the events
+
+    :Example:
+
+    >>> from lifecycles.generators import planted_event_lifecycle
+    >>> lc, events = planted_event_lifecycle(10000, 50, 20, rates={"split": 0.05}, backend="csr", seed=42)
+    """
+    rng = np.random.default_rng(seed)
+    partitions, events = planted_event_partitions(
+        n_elements, n_groups, n_steps, rates, growth, active, seed=rng
+    )
+    lc = LifeCycle(int, backend=backend)
+    lc.add_partitions_from(partitions)
+    _random_attribute(lc, n_elements, n_steps, n_categories, rng)
+    return lc, events
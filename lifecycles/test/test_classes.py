@@ -1,10 +1,15 @@
 import os
 import pickle
 import random
+import tempfile
 from collections import defaultdict
 from unittest import TestCase
 
+import numpy as np
+import pandas as pd
+
 from lifecycles import LifeCycle
+from lifecycles.classes.attributes import CategoricalAttribute
 
 
 class LifeCyclesTest(TestCase):
@@ -147,6 +152,29 @@ class LifeCyclesTest(TestCase):
         for v in memberships.values():
             self.assertGreater(len(v), 0)
 
+    def test_membership_index(self):
+        partitions = self.get_data()
+        for backend in ["sets", "csr"]:
+            lc = LifeCycle(int, backend=backend)
+            lc.add_partitions_from(partitions[:2])
+            self.assertEqual(lc.get_element_membership(2), ["0_7", "1_7"])
+
+            # the index is kept up to date by add_partition and filter_on_group_size
+            lc.add_partitions_from(partitions[2:])
+            lc.filter_on_group_size(min_size=40)
+            sliced = lc.slice(1, 3)
+            for lc_ in [lc, sliced]:
+                memberships = lc_.get_all_element_memberships()
+                self.assertEqual(set(memberships.keys()), lc_.universe_set())
+                for element, names in memberships.items():
+                    expected = [
+                        name
+                        for name in lc_.groups_ids()
+                        if element in lc_.get_group(name)
+                    ]
+                    self.assertEqual(names, expected)
+            self.assertEqual(lc.get_element_membership(-1), [])
+
     def test_attributes(self):
         data = self.get_data()
         lc = LifeCycle(int)
@@ -166,6 +194,92 @@ class LifeCyclesTest(TestCase):
 
         self.assertDictEqual(attrs, fakeattr)
 
+        for name in ["0_0", "3_2"]:
+            codes = lc.get_group_attribute_codes(name, "fakeattr")
+            self.assertEqual(codes.dtype, np.int8)
+            categories = lc.get_attribute_categories("fakeattr")
+            tid = int(name.split("_")[0])
+            self.assertListEqual(
+                [categories[c] for c in codes],
+                [attrs[element][tid] for element in lc.get_group(name)],
+            )
+
+        sliced = lc.slice(1, 3)
+        self.assertDictEqual(
+            sliced.get_attributes("fakeattr", of=next(iter(lc.get_group("1_0")))),
+            {
+                tid: value
+                for tid, value in attrs[next(iter(lc.get_group("1_0")))].items()
+                if tid in [1, 2]
+            },
+        )
+        with self.assertRaises(KeyError):
+            lc.get_attributes("fakeattr", of=-1)
+
+    def test_bulk_attributes(self):
+        data = self.get_data()
+        lc = LifeCycle(int)
+        lc.add_partitions_from(data)
+        attrs = self.random_attributes(lc)
+        lc.set_attributes(attrs, attr_name="fakeattr")
+
+        elements, tids, values = [], [], []
+        for element, temporal_values in attrs.items():
+            for tid, value in temporal_values.items():
+                elements.append(element)
+                tids.append(tid)
+                values.append(value)
+
+        lc2 = LifeCycle(int, backend="csr")
+        lc2.add_partitions_from(data)
+        lc2.set_attribute_values(
+            "fakeattr", np.array(elements), np.array(tids), np.array(values)
+        )
+        self.assertDictEqual(lc2.get_attributes("fakeattr"), attrs)
+
+        df = pd.DataFrame({"element": elements, "tid": tids, "fakeattr": values})
+        lc2.set_attributes_from_dataframe(df, "fakeattr2", value_col="fakeattr")
+        self.assertDictEqual(lc2.get_attributes("fakeattr2"), attrs)
+
+        # updates keep the other values, replace discards them
+        lc2.set_attribute_values("fakeattr", [elements[0]], [tids[0]], ["Z"])
+        self.assertEqual(lc2.get_attributes("fakeattr", of=elements[0])[tids[0]], "Z")
+        self.assertEqual(len(lc2.get_attributes("fakeattr")), len(attrs))
+        lc2.set_attribute_values(
+            "fakeattr", [elements[0]], [tids[0]], ["Z"], replace=True
+        )
+        self.assertDictEqual(
+            lc2.get_attributes("fakeattr"), {elements[0]: {tids[0]: "Z"}}
+        )
+        with self.assertRaises(ValueError):
+            lc2.set_attribute_values("fakeattr", [1], [-1], ["A"])
+
+    def test_attribute_growth(self):
+        # one time step (with new elements) at a time, as when streaming partitions
+        attr = CategoricalAttribute()
+        buffers = []
+        for tid in range(200):
+            ids = np.arange(10 * (tid + 1))
+            attr.set_values(ids, np.full(len(ids), tid), ids % 3)
+            if len(buffers) == 0 or attr._buffer is not buffers[-1]:
+                buffers.append(attr._buffer)
+        # reallocated geometrically (about log1.5(200) times per dimension), not at each step
+        self.assertLess(len(buffers), 30)
+        self.assertEqual(attr.codes.shape, (2000, 200))
+        self.assertGreaterEqual(attr._buffer.shape[0], 2000)
+        self.assertEqual(attr.gather([15, 1999], 199).tolist(), [0, 1])
+        self.assertEqual(attr.gather([5, 1999], 0).tolist(), [2, -1])
+        self.assertEqual(attr.gather([2000], 199).tolist(), [-1])
+        self.assertEqual(attr.element_values(1999), {199: 1})
+        self.assertEqual(len(attr.to_dict(list(range(2000)))), 2000)
+        self.assertEqual(attr.restrict([0]).codes.shape, (2000, 200))
+
+        # widening the codes keeps the values set so far
+        attr.set_values(np.arange(200), np.zeros(200), np.arange(200))
+        self.assertEqual(attr.codes.dtype, np.int16)
+        self.assertEqual(attr.gather([199], 0).tolist(), [199])
+        self.assertEqual(attr.gather([199], 199).tolist(), [1])
+
     def test_flow(self):
         data = self.get_data()
         lc = LifeCycle(int)
@@ -268,6 +382,35 @@ class LifeCyclesTest(TestCase):
             },
         )
 
+    def test_flow_matrix(self):
+        data = self.get_data()
+        for backend in ["sets", "csr"]:
+            lc = LifeCycle(int, backend=backend)
+            lc.add_partitions_from(data[:3])
+
+            flow_matrix = lc.get_flow_matrix(0, "+")
+            self.assertEqual(flow_matrix.counts.shape, (8, len(data[1])))
+            for name, flow in lc.all_flows("+").items():
+                self.assertEqual(
+                    lc.group_flow(name, "+", counts_only=True),
+                    {k: len(v) for k, v in flow.items()},
+                )
+            self.assertEqual(
+                lc.get_flow_matrix(1, "-").counts.toarray().tolist(),
+                flow_matrix.counts.T.toarray().tolist(),
+            )
+
+            # cached matrices are refreshed when the partitions change
+            self.assertEqual(lc.group_flow("2_0", "+"), {})
+            lc.add_partitions_from(data[3:])
+            self.assertGreater(len(lc.group_flow("2_0", "+")), 0)
+            lc.filter_on_group_size(min_size=40)
+            for name, flow in lc.all_flows("-", counts_only=True).items():
+                for ref_name, count in flow.items():
+                    self.assertEqual(
+                        count, len(lc.get_group(name) & lc.get_group(ref_name))
+                    )
+
     def test_minimum_branch_size(self):
         data = self.get_data()
         lc = LifeCycle(int)
@@ -287,6 +430,39 @@ class LifeCyclesTest(TestCase):
         self.assertEqual(lc.get_group("0_1"), {"d", "e", "f"})
         self.assertEqual(lc.get_element_membership("a"), ["0_0"])
 
+    def test_csr_backend(self):
+        data = self.get_data()
+        lc = LifeCycle(int)
+        lc.add_partitions_from(data)
+        lc_csr = LifeCycle(int, backend="csr")
+        lc_csr.add_partitions_from(data)
+
+        self.assertEqual(lc, lc_csr)
+        self.assertEqual(lc.groups_ids(), lc_csr.groups_ids())
+        self.assertEqual(lc.universe_set(), lc_csr.universe_set())
+        for tid in lc.temporal_ids():
+            self.assertEqual(lc.get_partition_at(tid), lc_csr.get_partition_at(tid))
+            self.assertEqual(
+                list(lc.group_iterator(tid)), list(lc_csr.group_iterator(tid))
+            )
+        self.assertEqual(lc.all_flows("+"), lc_csr.all_flows("+"))
+
+        partition = lc_csr.get_partition_csr(0)
+        self.assertEqual(partition.names(), lc.get_partition_at(0))
+        self.assertEqual(partition.indices.dtype.name, "int32")
+        self.assertEqual(partition.indptr[-1], sum(len(s) for s in data[0]))
+        # also available with the default backend
+        self.assertEqual(partition.names(), lc.get_partition_csr(0).names())
+
+        lc.filter_on_group_size(min_size=40, max_size=100)
+        lc_csr.filter_on_group_size(min_size=40, max_size=100)
+        self.assertEqual(lc, lc_csr)
+        self.assertEqual(lc.get_partition_at(1), lc_csr.get_partition_at(1))
+        self.assertEqual(lc.slice(1, 3), lc_csr.slice(1, 3))
+
+        with self.assertRaises(ValueError):
+            LifeCycle(int, backend="arrays")
+
     def test_conversion(self):
         data = self.get_data()
         lc = LifeCycle(int)
@@ -302,6 +478,15 @@ class LifeCyclesTest(TestCase):
         lc2.read_json(file_path)
 
         self.assertEqual(lc, lc2)
+        self.assertEqual(lc.temporal_ids(), lc2.temporal_ids())
+        for tid in lc.temporal_ids():
+            self.assertEqual(lc.get_partition_at(tid), lc2.get_partition_at(tid))
+        self.assertEqual(lc.group_flow("1_0", "+"), lc2.group_flow("1_0", "+"))
+
+        lc3 = LifeCycle(int, backend="csr")
+        lc3.read_json(file_path)
+        self.assertEqual(lc, lc3)
+        self.assertEqual(lc.get_partition_at(2), lc3.get_partition_at(2))
 
         os.remove(file_path)
 
@@ -315,3 +500,93 @@ class LifeCyclesTest(TestCase):
         lc2.read_json(file_path)
         self.assertEqual(lc, lc2)
         os.remove(file_path)
+
+    def test_binary_conversion(self):
+        data = self.get_data()
+        with tempfile.TemporaryDirectory() as tmp:
+            for backend in ["sets", "csr"]:
+                lc = LifeCycle(int, backend=backend)
+                lc.add_partitions_from(data)
+                lc.filter_on_group_size(min_size=10)
+                lc.set_attributes(self.random_attributes(lc), attr_name="fakeattr")
+                path = os.path.join(tmp, backend)
+                lc.write_binary(path)
+
+                lc2 = LifeCycle(str)
+                lc2.read_binary(path)
+                self.assertEqual(lc2.backend, "csr")
+                self.assertIs(lc2.dtype, int)
+                # mapped, not read
+                self.assertIsInstance(lc2.get_partition_csr(0).indices, np.memmap)
+                self.assertEqual(lc, lc2)
+                self.assertEqual(lc.temporal_ids(), lc2.temporal_ids())
+                self.assertEqual(lc.tid_to_named_sets, lc2.tid_to_named_sets)
+                self.assertEqual(
+                    lc.get_attributes("fakeattr"), lc2.get_attributes("fakeattr")
+                )
+                self.assertEqual(lc.all_flows("+"), lc2.all_flows("+"))
+                self.assertEqual(lc.slice(1, 3), lc2.slice(1, 3))
+                element = next(iter(lc.get_group("0_0")))
+                self.assertEqual(
+                    lc.get_element_membership(element),
+                    lc2.get_element_membership(element),
+                )
+
+                lc3 = LifeCycle()
+                lc3.read_binary(path, mmap=False)
+                self.assertNotIsInstance(lc3.get_partition_csr(0).indices, np.memmap)
+                self.assertEqual(lc, lc3)
+
+                # loaded lifecycles remain editable, without modifying the files
+                for lc_ in [lc, lc2]:
+                    lc_.add_partition([[1, 2, 3], [-1]])
+                    lc_.set_attribute_values("fakeattr", [1, -1], [0, 0], ["Z", "Z"])
+                    lc_.filter_on_group_size(min_size=20)
+                self.assertEqual(lc, lc2)
+                self.assertEqual(
+                    lc.get_attributes("fakeattr"), lc2.get_attributes("fakeattr")
+                )
+
+            # non int
+            lc = LifeCycle(str)
+            lc.add_partition([["a", "b", "c"], ["d", "e", "f"]])
+            lc.add_partition([["a", "bb"], ["c", "d", "e", "f"]])
+            lc.write_binary(os.path.join(tmp, "str"))
+            lc2 = LifeCycle(int)
+            lc2.read_binary(os.path.join(tmp, "str"))
+            self.assertEqual(lc, lc2)
+            self.assertEqual(lc2.to_dict()["dtype"], "str")
+
+            # writing back to the directory it was read from leaves the mapped files intact, and no temporary files
+            lc2.write_binary(os.path.join(tmp, "str"))
+            lc3 = LifeCycle()
+            lc3.read_binary(os.path.join(tmp, "str"))
+            self.assertEqual(lc, lc2)
+            self.assertEqual(lc, lc3)
+            self.assertEqual(lc2.get_partition_at(0), lc3.get_partition_at(0))
+            self.assertEqual(
+                sorted(os.listdir(os.path.join(tmp, "str"))),
+                [
+                    "elements.npy",
+                    "gids.npy",
+                    "indices.npy",
+                    "indptr.npy",
+                    "lifecycle.json",
+                    "offsets.npy",
+                ],
+            )
+
+            lc = LifeCycle(str)
+            lc.add_partition([["a", "b"]])
+            lc.set_attributes({"a": {0: 1j}}, "attr")
+            with self.assertRaises(TypeError):
+                lc.write_binary(os.path.join(tmp, "invalid"))
+            self.assertFalse(os.path.exists(os.path.join(tmp, "invalid")))
+            with self.assertRaises(FileNotFoundError):
+                lc.read_binary(os.path.join(tmp, "invalid"))
+
+            lc = LifeCycle()
+            lc.add_partition([[1, "a"]])
+            with self.assertRaises(TypeError):
+                lc.write_binary(os.path.join(tmp, "mixed"))
+            self.assertFalse(os.path.exists(os.path.join(tmp, "mixed")))
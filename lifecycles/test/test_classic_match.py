@@ -0,0 +1,175 @@
+import pickle
+import random
+from itertools import combinations
+from unittest import TestCase
+
+import numpy as np
+
+from lifecycles import LifeCycle
+from lifecycles.algorithms.classic_match import *
+from lifecycles.algorithms.classic_match import (
+    _asur_merge_score,
+    _asur_pair_scores,
+    _greene_merge_score,
+)
+
+
+class ClassicMatchTest(TestCase):
+    @staticmethod
+    def lc4test(backend="sets"):
+        lc = LifeCycle(int, backend=backend)
+        with open("testbed.pkl", "rb") as f:
+            data = pickle.load(f)
+        lc.add_partitions_from(data)
+        return lc
+
+    def test_events_asur(self):
+        lc = LifeCycle()
+        lc.add_partition([[1, 2, 3], [4, 5], [6, 7]])
+        lc.add_partition([[1, 2, 3, 4, 5], [6, 7], [8, 9]])
+        lc.add_partition([[1, 2], [3, 4, 5], [6, 7]])
+
+        events = events_asur(lc, 0.5)
+        self.assertListEqual(
+            list(events.keys()), ["merge", "split", "birth", "death", "continue"]
+        )
+        self.assertListEqual(
+            events["merge"],
+            [{"src": "1_0", "type": "merge", "score": 1.0, "ref_sets": ["0_0", "0_1"]}],
+        )
+        self.assertListEqual(
+            events["split"],
+            [{"src": "1_0", "type": "split", "score": 1.0, "ref_sets": ["2_0", "2_1"]}],
+        )
+        self.assertListEqual(events["birth"], [{"src": "1_2", "type": "birth"}])
+        self.assertListEqual(events["death"], [{"src": "1_2", "type": "death"}])
+        self.assertListEqual(
+            events["continue"],
+            [
+                {"src": "0_2", "type": "continue", "ref_set": "1_1"},
+                {"src": "1_1", "type": "continue", "ref_set": "2_2"},
+            ],
+        )
+        self.assertListEqual(events_asur(lc, 1)["merge"], [])
+
+    def test_events_asur_backends(self):
+        events = events_asur(self.lc4test(), 0.1)
+        self.assertEqual(len(events["merge"]), 33)
+        self.assertEqual(len(events["split"]), 23)
+        self.assertDictEqual(events, events_asur(self.lc4test("csr"), 0.1))
+
+    def test_asur_pair_scores(self):
+        random.seed(3)
+        elements = list(range(200))
+        random.shuffle(elements)
+        cuts = sorted(random.sample(range(1, 200), 30))
+        reference = [set(elements[a:b]) for a, b in zip([0] + cuts, cuts + [200])]
+        target = set(random.sample(range(200), 80))
+        branches = [r for r in reference if r & target]
+        counts = [len(r & target) for r in branches]
+        sizes = [len(r) for r in branches]
+
+        for th in [0, 0.05, 0.1, 0.2, 0.5]:
+            expected = [
+                (i, j, _asur_merge_score(target, [branches[i], branches[j]]))
+                for i, j in combinations(range(len(branches)), 2)
+            ]
+            expected = [pair for pair in expected if pair[2] > th]
+            firsts, seconds, scores = _asur_pair_scores(counts, sizes, len(target), th)
+            self.assertListEqual(
+                list(zip(firsts.tolist(), seconds.tolist(), scores.tolist())), expected
+            )
+
+        firsts, _, _ = _asur_pair_scores(np.array([3]), np.array([5]), 4, 0.5)
+        self.assertEqual(len(firsts), 0)
+
+    def test_events_asur_overlapping(self):
+        lc = LifeCycle()
+        lc.add_partition([[1, 2, 3], [3, 4, 5]])
+        lc.add_partition([[1, 2, 3, 4, 5]])
+        self.assertListEqual(
+            events_asur(lc, 0.5)["merge"],
+            [{"src": "1_0", "type": "merge", "score": 1.0, "ref_sets": ["0_0", "0_1"]}],
+        )
+
+    def test_event_graph_greene(self):
+        lc = self.lc4test()
+        for th in [0, 0.1, 0.3]:
+            expected = list()
+            for t in lc.temporal_ids()[:-1]:
+                for name in lc.get_partition_at(t):
+                    for r in lc.group_flow(name, "+"):
+                        score = _greene_merge_score(lc.get_group(name), lc.get_group(r))
+                        if score > th:
+                            expected.append((t, name, r, score))
+            self.assertListEqual(event_graph_greene(lc, th), expected)
+        self.assertListEqual(
+            event_graph_greene(lc, 0.1), event_graph_greene(self.lc4test("csr"), 0.1)
+        )
+
+    def test_greene_tracker(self):
+        lc = LifeCycle()
+        lc.add_partition([[1, 2, 3], [4, 5, 6]])
+        lc.add_partition([[1, 2, 3, 4]])
+        lc.add_partition([[1, 2, 3], [4, 5, 6]])
+
+        # 0_1 has no match in partition 1, and is only recovered looking two steps back
+        tracker = GreeneTracker(lc, th=0.3)
+        self.assertDictEqual(
+            tracker.communities(), {0: ["0_0", "1_0", "2_0"], 1: ["0_1"], 2: ["2_1"]}
+        )
+        tracker = GreeneTracker(lc, th=0.3, max_gap=2)
+        self.assertDictEqual(
+            tracker.communities(), {0: ["0_0", "1_0", "2_0"], 1: ["0_1", "2_1"]}
+        )
+
+        # split and merge
+        lc.add_partition([[1, 2], [3], [4, 5, 6]])
+        lc.add_partition([[1, 2, 3, 4, 5, 6]])
+        self.assertListEqual(tracker.update(), [3, 4])
+        memberships = tracker.memberships()
+        self.assertListEqual(memberships["3_0"], [0])
+        self.assertListEqual(memberships["3_1"], [2])
+        self.assertListEqual(memberships["3_2"], [1])
+        self.assertListEqual(memberships["4_0"], [0, 1])
+        self.assertListEqual(memberships["2_0"], [0, 2])
+        self.assertListEqual(tracker.communities()[2], ["0_0", "1_0", "2_0", "3_1"])
+
+        # changing a processed partition tracks the communities again
+        lc.filter_on_group_size(min_size=4)
+        self.assertListEqual(tracker.update(), [0, 1, 2, 3, 4])
+        self.assertDictEqual(
+            tracker.memberships(), GreeneTracker(lc, th=0.3, max_gap=2).memberships()
+        )
+
+        with self.assertRaises(ValueError):
+            GreeneTracker(lc, max_gap=0)
+
+    def test_greene_tracker_matches(self):
+        lc = self.lc4test()
+        # with max_gap=1, consecutive groups of a dynamic community are the edges of the event graph
+        communities = GreeneTracker(lc, th=0.1).communities()
+        pairs = {
+            (a, b) for names in communities.values() for a, b in zip(names, names[1:])
+        }
+        edges = {(a, b) for _, a, b, _ in event_graph_greene(lc, 0.1)}
+        self.assertSetEqual(pairs, edges)
+
+        tracker = GreeneTracker(self.lc4test("csr"), th=0.1)
+        self.assertDictEqual(tracker.communities(), communities)
+        memberships = tracker.memberships()
+        self.assertListEqual(sorted(memberships), sorted(lc.groups_ids()))
+
+    def test_sweeps(self):
+        lc = self.lc4test()
+        thresholds = [0.5, 0, 0.1, 0.25, 1]
+        events, counts = events_asur_sweep(lc, thresholds)
+        edges, edge_counts = event_graph_greene_sweep(lc, thresholds)
+        self.assertListEqual(list(events.keys()), thresholds)
+        for th in thresholds:
+            self.assertDictEqual(events[th], events_asur(lc, th))
+            self.assertDictEqual(counts[th], {k: len(v) for k, v in events[th].items()})
+            self.assertListEqual(edges[th], event_graph_greene(lc, th))
+            self.assertEqual(edge_counts[th], len(edges[th]))
+
+        self.assertTupleEqual(events_asur_sweep(lc, []), ({}, {}))
@@ -1,10 +1,12 @@
 import pickle
 import random
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from unittest import TestCase
 
 from lifecycles import LifeCycle
 from lifecycles.algorithms.event_analysis import *
+from lifecycles.algorithms.measures import event_typicality
 
 
 class EventAnalysisTest(TestCase):
@@ -81,3 +83,111 @@ class EventAnalysisTest(TestCase):
 
         fcts = facets(lc, "2_0", "+")
         self.assertEqual(sorted(fcts.keys()), ["I", "O", "U", "size"])
+
+    def test_events_both_directions(self):
+        lc = self.lc4test()
+        evs = events_all(lc)
+        self.assertListEqual(list(evs.keys()), ["+", "-"])
+
+        lc = self.lc4test()  # no cached flows
+        self.assertDictEqual(evs["+"], events_all(lc, "+")["+"])
+        self.assertDictEqual(evs["-"], events_all(lc, "-")["-"])
+        for name, weights in evs["-"].items():
+            self.assertDictEqual(weights, event_weights(lc, name, "-"))
+
+        with self.assertRaises(ValueError):
+            events_all(lc, "x")
+
+    def test_parallel(self):
+        lc = self.lc4test()
+        evs = events_all(lc)
+        flows = analyze_all_flows(lc, "-", attr="attr")
+
+        self.assertDictEqual(evs, events_all(lc, n_jobs=2))
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            self.assertDictEqual(evs, events_all(lc, executor=executor))
+            self.assertDictEqual(
+                flows, analyze_all_flows(lc, "-", attr="attr", executor=executor)
+            )
+        self.assertDictEqual(flows, analyze_all_flows(lc, "-", attr="attr", n_jobs=2))
+
+    def test_event_tracker(self):
+        with open("testbed.pkl", "rb") as f:
+            data = pickle.load(f)
+
+        lc = LifeCycle(int)
+        tracker = EventTracker(lc)
+        self.assertDictEqual(tracker.events(), {"+": {}, "-": {}})
+        for i, partition in enumerate(data):
+            lc.add_partition(partition)
+            self.assertListEqual(tracker.update(), [i - 1] if i > 0 else [])
+            self.assertDictEqual(tracker.events(), events_all(lc))
+        self.assertListEqual(tracker.update(), [])
+
+        lc.filter_on_group_size(min_size=5)
+        self.assertDictEqual(tracker.events(), events_all(lc))
+        self.assertDictEqual(tracker.events("-"), events_all(lc, "-"))
+
+        tracker = EventTracker(lc, "+")
+        self.assertDictEqual(tracker.events(), events_all(lc, "+"))
+        with self.assertRaises(ValueError):
+            tracker.events("-")
+
+    def test_table_output(self):
+        lc = self.lc4test()
+        evs = events_all(lc)
+        tables = events_all(lc, output="array")
+        for d in ["+", "-"]:
+            self.assertEqual(len(tables[d]), len(evs[d]))
+            for row in tables[d]:
+                name = f"{row['tid']}_{row['gid']}"
+                weights = evs[d][name]
+                for event_name, weight in weights.items():
+                    self.assertEqual(row[event_name], weight)
+                self.assertEqual(
+                    (row["event"], row["typicality"]), event_typicality(weights)
+                )
+
+        flows = analyze_all_flows(lc, "+", 2, attr="attr")
+        df = analyze_all_flows(lc, "+", 2, attr="attr", output="dataframe")
+        self.assertListEqual(
+            [f"{tid}_{gid}" for tid, gid in zip(df["tid"], df["gid"])],
+            list(flows.keys()),
+        )
+        for key in ["U", "I", "O", "size", "attr_H", "attr_purity", "attr_mca"]:
+            self.assertListEqual(
+                df[key].tolist(), [flow[key] for flow in flows.values()]
+            )
+
+        with self.assertRaises(ValueError):
+            events_all(lc, output="json")
+
+    def test_empty_table_output(self):
+        lc = self.lc4test()
+        tables = events_all(lc, output="array")
+        table = analyze_all_flows(lc, "+", attr="attr", output="array")
+
+        # tables without rows keep all the columns, with the same types
+        for lc_ in [LifeCycle(int), lc.slice(0, 1)]:
+            empty = events_all(lc_, output="array")
+            for d in ["+", "-"]:
+                self.assertEqual(len(empty[d]), 0)
+                self.assertEqual(empty[d].dtype, tables[d].dtype)
+            dfs = events_all(lc_, output="dataframe")
+            for d in ["+", "-"]:
+                self.assertEqual(len(dfs[d]), 0)
+                self.assertListEqual(list(dfs[d].columns), list(tables[d].dtype.names))
+                self.assertEqual(dfs[d]["U"].dtype, tables[d]["U"].dtype)
+            self.assertDictEqual(events_all(lc_), {"+": {}, "-": {}})
+            self.assertDictEqual(analyze_all_flows(lc_, "-"), {})
+
+        lc_ = lc.slice(0, 1)
+        empty = analyze_all_flows(lc_, "+", attr="attr", output="array")
+        self.assertEqual(len(empty), 0)
+        self.assertEqual(empty.dtype, table.dtype)
+        df = analyze_all_flows(lc_, "+", attr="attr", output="dataframe")
+        self.assertListEqual(list(df.columns), list(table.dtype.names))
+        self.assertEqual(
+            analyze_all_flows(LifeCycle(int), "+", output="array").dtype.names,
+            ("tid", "gid", "U", "I", "O", "size"),
+        )
@@ -0,0 +1,107 @@
+from unittest import TestCase
+
+from lifecycles.algorithms.classic_match import events_asur
+from lifecycles.generators import *
+
+
+class GeneratorsTest(TestCase):
+    def test_random_partitions(self):
+        partitions = random_partitions(1000, 10, 5, churn=0.2, seed=1)
+        self.assertEqual(len(partitions), 5)
+        for partition in partitions:
+            self.assertLessEqual(len(partition), 10)
+            members = [e for group in partition for e in group]
+            self.assertListEqual(sorted(members), list(range(1000)))
+        self.assertListEqual(
+            partitions, random_partitions(1000, 10, 5, churn=0.2, seed=1)
+        )
+
+        # churn: the fraction of elements changing group between two steps
+        first = {e: i for i, group in enumerate(partitions[0]) for e in group}
+        second = {e: i for i, group in enumerate(partitions[1]) for e in group}
+        moved = sum(first[e] != second[e] for e in range(1000)) / 1000
+        self.assertAlmostEqual(moved, 0.2 * 9 / 10, delta=0.05)
+
+        static = random_partitions(100, 4, 3, churn=0, seed=2)
+        self.assertListEqual(static[0], static[2])
+
+        overlapping = random_partitions(1000, 10, 2, overlap=0.3, seed=1)
+        for partition in overlapping:
+            n_members = sum(len(group) for group in partition)
+            self.assertAlmostEqual(n_members / 1000, 1.3, delta=0.05)
+            for group in partition:
+                self.assertEqual(len(group), len(set(group)))
+
+    def test_random_lifecycle(self):
+        lc = random_lifecycle(500, 5, 4, n_categories=3, seed=7)
+        self.assertListEqual(lc.temporal_ids(), [0, 1, 2, 3])
+        self.assertEqual(len(lc.universe_set()), 500)
+        self.assertSetEqual(set(lc.get_attribute_categories("attr")), {0, 1, 2})
+        self.assertEqual(len(lc.get_attributes("attr", of=0)), 4)
+
+        csr = random_lifecycle(500, 5, 4, n_categories=3, seed=7, backend="csr")
+        self.assertDictEqual(lc.all_flows("+"), csr.all_flows("+"))
+
+    def test_planted_events(self):
+        lc, planted = planted_event_lifecycle(2000, 20, 8, seed=3)
+        self.assertSetEqual(
+            set(planted["+"]), {n for n in lc.groups_ids() if not n.startswith("7_")}
+        )
+        self.assertSetEqual(
+            set(planted["-"]), {n for n in lc.groups_ids() if not n.startswith("0_")}
+        )
+        for direction in ["+", "-"]:
+            self.assertSetEqual(
+                set(planted[direction].values()),
+                {"continuation", "growth", "split", "merge", "death", "birth"}
+                - ({"birth"} if direction == "+" else {"death"}),
+            )
+
+        # without noise, the planted events are exactly those found by Asur et al.
+        found = events_asur(lc, 0.99)
+        for event in ["birth", "death"]:
+            direction = "-" if event == "birth" else "+"
+            self.assertSetEqual(
+                {e["src"] for e in found[event]},
+                {n for n, e in planted[direction].items() if e == event},
+            )
+        self.assertSetEqual(
+            {e["src"] for e in found["continue"]},
+            {n for n, e in planted["+"].items() if e == "continuation"},
+        )
+        self.assertSetEqual(
+            {e["src"] for e in found["merge"]},
+            {n for n, e in planted["-"].items() if e == "merge"},
+        )
+        self.assertSetEqual(
+            {e["src"] for e in found["split"]},
+            {n for n, e in planted["+"].items() if e == "split"},
+        )
+        for name, event in planted["-"].items():
+            if event == "growth":
+                self.assertGreater(len(lc.get_group(name)), 1)
+
+        partitions, _ = planted_event_partitions(2000, 20, 8, seed=3)
+        self.assertListEqual(
+            partitions,
+            [
+                [sorted(lc.get_group(n)) for n in lc.get_partition_at(t)]
+                for t in range(8)
+            ],
+        )
+
+    def test_planted_rates(self):
+        _, planted = planted_event_partitions(
+            5000,
+            50,
+            5,
+            rates={"merge": 0, "split": 0, "death": 0, "growth": 0, "birth": 0},
+            seed=1,
+        )
+        self.assertSetEqual(set(planted["+"].values()), {"continuation"})
+        _, planted = planted_event_partitions(
+            5000, 50, 5, rates={"death": 1, "growth": 0, "split": 0, "merge": 0}, seed=1
+        )
+        self.assertSetEqual(set(planted["+"].values()), {"death"})
+        with self.assertRaises(ValueError):
+            planted_event_partitions(rates={"death": 0.6, "merge": 0.6})
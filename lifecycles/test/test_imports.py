@@ -0,0 +1,73 @@
+import os
+import statistics
+import subprocess
+import sys
+from unittest import TestCase
+
+import lifecycles
+
+# run the interpreter from the directory containing the package
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(lifecycles.__file__)))
+
+
+def _run(*args) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *args], capture_output=True, text=True, check=True, cwd=ROOT
+    )
+
+
+class ImportsTest(TestCase):
+    def test_lazy_imports(self):
+        loaded = _run(
+            "-c",
+            "import sys, lifecycles\n"
+            "heavy = ['matplotlib', 'plotly', 'pandas', 'scipy']\n"
+            "print(' '.join(m for m in heavy if m in sys.modules))",
+        ).stdout
+        self.assertEqual(loaded.strip(), "")
+
+        loaded = _run(
+            "-c",
+            "import sys, lifecycles\n"
+            "lifecycles.validate_flow\n"
+            "print('scipy.stats' in sys.modules, 'matplotlib' in sys.modules)",
+        ).stdout
+        self.assertEqual(loaded.strip(), "True False")
+
+    def test_import_time(self):
+        # importing the package must stay much cheaper than importing it along with the plotting and validation
+        # stacks. Single runs are noisy on loaded machines: compare medians, with a generous margin (lazy imports
+        # currently take about a fifth of the eager ones)
+        timer = "import time\nstart = time.perf_counter()\n{}\nprint(time.perf_counter() - start)"
+
+        def median_time(statement: str) -> float:
+            return statistics.median(
+                float(_run("-c", timer.format(statement)).stdout) for _ in range(5)
+            )
+
+        lazy = median_time("import lifecycles")
+        eager = median_time("import lifecycles, lifecycles.validation, lifecycles.viz")
+        self.assertLess(lazy, eager / 2)
+
+    def test_lazy_names(self):
+        from lifecycles.validation import validation
+        from lifecycles.viz import viz
+
+        self.assertSetEqual(
+            set(lifecycles._lazy_names), set(validation.__all__) | set(viz.__all__)
+        )
+        for name, module in lifecycles._lazy_names.items():
+            self.assertIs(getattr(lifecycles, name), getattr(sys.modules[module], name))
+            self.assertIn(name, dir(lifecycles))
+        with self.assertRaises(AttributeError):
+            lifecycles.not_a_function
+
+    def test_star_import(self):
+        namespace = dict()
+        exec("from lifecycles import *", namespace)
+        del namespace["__builtins__"]
+        self.assertSetEqual(set(namespace), set(lifecycles.__all__))
+        self.assertEqual(len(lifecycles.__all__), len(set(lifecycles.__all__)))
+        for name in ["algorithms", "classes", "generators", "utils", "validation"]:
+            self.assertNotIn(name, namespace)
+        self.assertIn("validate_flow", namespace)  # lazy names included
@@ -3,6 +3,8 @@ import random
 from collections import defaultdict
 from unittest import TestCase
 
+import numpy as np
+
 import lifecycles
 from lifecycles import LifeCycle
 from lifecycles.algorithms.measures import *
@@ -60,6 +62,79 @@ class MeasuresTest(TestCase):
         self.assertEqual(facet_outflow({1, 3}, [{1}, {2}]), 0.5)
         self.assertEqual(facet_outflow({1, 2}, [{1}, {2}]), 0)
 
+    def test_batch_facets(self):
+        lc = self.lc4test()
+        lc.add_partition([[1, 2, 3, 4], [3, 4, 5], [5, 6]])  # overlapping groups
+        lc.add_partition([[1, 2, 3, 4, 5, 6], [5, 6, 7]])
+        for tid in lc.temporal_ids()[:-1]:
+            for min_branch_size in [1, 3]:
+                source = lc.get_partition_csr(tid)
+                flow_matrix = lc.get_flow_matrix(tid, "+")
+                res = batch_facets(
+                    flow_matrix.counts,
+                    source.sizes(),
+                    flow_matrix.reference.sizes(),
+                    min_branch_size=min_branch_size,
+                    covered=flow_matrix.covered(min_branch_size),
+                )
+                for row, name in enumerate(source.names()):
+                    target = lc.get_group(name)
+                    flow = lc.group_flow(name, "+", min_branch_size=min_branch_size)
+                    reference = [lc.get_group(ref) for ref in flow]
+                    labels = [i for i, b in enumerate(flow.values()) for _ in b]
+                    self.assertAlmostEqual(res["U"][row], facet_unicity(labels))
+                    self.assertAlmostEqual(
+                        res["I"][row], facet_identity(target, reference)
+                    )
+                    self.assertAlmostEqual(
+                        res["O"][row], facet_outflow(target, reference)
+                    )
+                    self.assertEqual(res["size"][row], len(target))
+
+    def test_batch_label_stats(self):
+        lc = self.lc4test()
+        lc.set_attribute_values("attr", [1, 2, 3], [1, 1, 1], ["A", "A", "A"])
+        categories = lc.get_attribute_categories("attr")
+        for tid in lc.temporal_ids()[:-1]:
+            stats = batch_label_stats(
+                *lc.get_partition_attribute_codes(tid, "attr"), categories=categories
+            )
+            reference = batch_label_stats(
+                *lc.get_partition_attribute_codes(tid + 1, "attr")
+            )
+            for min_branch_size in [0, 1, 50]:
+                change = batch_facet_metadata(
+                    lc.get_flow_matrix(tid, "+").counts,
+                    stats["H"],
+                    reference["H"],
+                    min_branch_size=min_branch_size,
+                )
+                for row, name in enumerate(lc.get_partition_at(tid)):
+                    labels = lifecycles.get_group_attribute_values(lc, name, "attr")
+                    try:
+                        entropy = _normalized_shannon_entropy(labels)
+                    except ZeroDivisionError:
+                        entropy = 0
+                    self.assertEqual(stats["H"][row], entropy)
+                    self.assertEqual(
+                        (categories[stats["mca"][row]], stats["purity"][row]),
+                        purity(labels),
+                    )
+
+                    flow = lc.group_flow(name, "+", min_branch_size)
+                    expected = facet_metadata(
+                        labels,
+                        [
+                            lifecycles.get_group_attribute_values(lc, ref, "attr")
+                            for ref in flow
+                        ],
+                        base=2,
+                    )
+                    if expected is None:
+                        self.assertTrue(np.isnan(change[row]))
+                    else:
+                        self.assertEqual(change[row], expected)
+
     def test_stability(self):
         lc = self.lc4test()
         self.assertEqual(
@@ -69,6 +144,28 @@ class MeasuresTest(TestCase):
 
     def test_purity(self):
         self.assertEqual(purity([1, 1, 1, 2, 2]), (1, 0.6))
+        # ties are broken in favor of the smallest value, whatever the order of the labels
+        self.assertEqual(purity(["b", "a", "b", "a"]), ("a", 0.5))
+        self.assertEqual(purity([2, None, None, 2]), (None, 0.5))
+        res = batch_label_stats(
+            [0, 4, 6], [0, 1, 0, 1, 2, 0], categories=["b", "a", "c"]
+        )
+        self.assertListEqual(res["mca"].tolist(), [1, 0])
+
+        # same most common values with both backends, group by group or all at once
+        mcas = []
+        for backend in ["sets", "csr"]:
+            lc = lifecycles.random_lifecycle(
+                200, 20, 4, n_categories=3, seed=1, backend=backend
+            )
+            flows = lifecycles.analyze_all_flows(lc, "+", attr="attr")
+            for name, flow in flows.items():
+                self.assertEqual(
+                    flow["attr_mca"],
+                    lifecycles.analyze_flow(lc, name, "+", attr="attr")["attr_mca"],
+                )
+            mcas.append({name: flow["attr_mca"] for name, flow in flows.items()})
+        self.assertDictEqual(mcas[0], mcas[1])
 
     def test_event_typicality(self):
 
@@ -1,7 +1,16 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
 from collections import defaultdict
 from unittest import TestCase
 
+import lifecycles
+from lifecycles.algorithms.classic_match import events_asur
+from lifecycles.algorithms.event_analysis import events_all
 from lifecycles.classes.classes import LifeCycle
+from lifecycles.utils.instrumentation import *
 from lifecycles.utils.utils import *
 
 
@@ -19,3 +28,60 @@ class UtilsTest(TestCase):
         lc.set_attributes(attrs, attr_name="attr")
         res = get_group_attribute_values(lc, "0_0", "attr")
         self.assertListEqual(res, ["VALUE", "VALUE", "VALUE"])
+
+    def test_profiling(self):
+        lc = LifeCycle(int)
+        lc.add_partition([[1, 2, 3], [4, 5, 6], [7, 8]])
+        lc.add_partition([[1, 2], [3, 4, 5, 6], [7, 8, 9]])
+
+        reset_profile()
+        events_all(lc)
+        self.assertDictEqual(get_profile(), {})  # off by default
+
+        with profiling() as profile:
+            events_all(lc)
+            lc.group_flow("0_1", "+")
+            events_asur(lc)
+        stages = profile()
+        self.assertEqual(stages["events_all"]["calls"], 1)
+        self.assertEqual(stages["events_all"]["items"], 6)
+        self.assertEqual(stages["LifeCycle.group_flow"]["items"], 1)
+        self.assertIn("events_asur", stages)
+        self.assertGreater(stages["events_all"]["time"], 0)
+        self.assertGreaterEqual(
+            stages["events_all"]["time"], stages["_events_flow_matrix"]["time"]
+        )
+
+        events_all(lc)  # off again
+        self.assertEqual(get_profile()["events_all"]["calls"], 1)
+        with profiling(reset=False):
+            events_all(lc)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "profile.json")
+            stages = get_profile(path)
+            with open(path) as f:
+                self.assertDictEqual(json.load(f), stages)
+        self.assertEqual(stages["events_all"]["calls"], 2)
+        reset_profile()
+        self.assertDictEqual(get_profile(), {})
+
+    def test_profiling_env(self):
+        code = (
+            "import lifecycles as lcs\n"
+            "lc = lcs.LifeCycle()\n"
+            "lc.add_partition([[1, 2], [3]])\n"
+            "lc.add_partition([[1, 2, 3]])\n"
+            "lcs.events_all(lc)\n"
+            "print(lcs.get_profile()['events_all']['calls'])"
+        )
+        root = os.path.dirname(os.path.dirname(os.path.abspath(lifecycles.__file__)))
+        env = dict(os.environ, LIFECYCLES_PROFILE="1")
+        res = subprocess.run(
+            [sys.executable, "-c", code],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=root,
+            env=env,
+        )
+        self.assertEqual(res.stdout.strip(), "1")
@@ -1,8 +1,15 @@
 import pickle
 from unittest import TestCase
 
+import numpy as np
+import scipy.stats as stats
+
 from lifecycles.classes.classes import LifeCycle
-from lifecycles.validation.validation import validate_all_flows
+from lifecycles.validation.validation import (
+    NullModelCache,
+    validate_all_flows,
+    validate_flow,
+)
 
 
 class ValidationTest(TestCase):
@@ -25,3 +32,185 @@ class ValidationTest(TestCase):
         self.assertListEqual(
             list(validate_all_flows(lc, direction="-").keys()), lc.groups_ids()
         )
+
+    def test_validate_all_flows_parallel(self):
+        data = self.get_data()
+        lc = LifeCycle(int)
+        lc.add_partitions_from(data)
+        validated = validate_all_flows(lc, direction="+", iterations=10, n_jobs=2)
+        self.assertListEqual(list(validated.keys()), lc.groups_ids())
+        for name, flow in lc.all_flows("+").items():
+            self.assertListEqual(list(validated[name].keys()), list(flow.keys()))
+
+    def test_validate_all_flows_analytic(self):
+        data = self.get_data()
+        lc = LifeCycle(int)
+        lc.add_partitions_from(data)
+        validated = validate_all_flows(lc, direction="+", method="analytic")
+        self.assertListEqual(list(validated.keys()), lc.groups_ids())
+
+        target = "0_0"
+        self.assertDictEqual(
+            validate_flow(lc, target, "+", method="analytic"), validated[target]
+        )
+        total = sum(len(lc.get_group(name)) for name in lc.get_partition_at(1))
+        for name, size in lc.group_flow(target, "+", counts_only=True).items():
+            dist = stats.hypergeom(total, len(lc.get_group(name)), size)
+            self.assertAlmostEqual(validated[target][name]["mean"], dist.mean())
+            self.assertAlmostEqual(validated[target][name]["std"], dist.std())
+            self.assertAlmostEqual(
+                validated[target][name]["p-value"], dist.sf(size - 1)
+            )
+
+        with self.assertRaises(ValueError):
+            validate_all_flows(lc, direction="+", method="exact")
+
+    def test_validate_all_flows_montecarlo(self):
+        data = self.get_data()
+        lc = LifeCycle(int)
+        lc.add_partitions_from(data)
+        validated = validate_all_flows(
+            lc, direction="-", method="montecarlo", iterations=2000, seed=7
+        )
+        self.assertListEqual(list(validated.keys()), lc.groups_ids())
+        self.assertDictEqual(
+            validated,
+            validate_all_flows(
+                lc, direction="-", method="montecarlo", iterations=2000, seed=7
+            ),
+        )
+
+        analytic = validate_all_flows(lc, direction="-", method="analytic")
+        for target, flow in validated.items():
+            for name, null_model in flow.items():
+                expected = analytic[target][name]
+                self.assertAlmostEqual(
+                    null_model["mean"],
+                    expected["mean"],
+                    delta=0.2 + expected["std"] / 5,
+                )
+
+        self.assertDictEqual(
+            validate_flow(lc, "3_0", "-", method="montecarlo", seed=3),
+            validate_flow(
+                lc, "3_0", "-", method="montecarlo", seed=np.random.SeedSequence(3)
+            ),
+        )
+        self.assertDictEqual(
+            validate_flow(
+                lc, "3_0", "-", method="montecarlo", seed=np.random.default_rng(3)
+            ),
+            validate_flow(
+                lc, "3_0", "-", method="montecarlo", seed=np.random.default_rng(3)
+            ),
+        )
+
+    def test_validate_all_flows_sequential(self):
+        data = self.get_data()
+        lc = LifeCycle(int)
+        lc.add_partitions_from(data)
+        validated = validate_all_flows(
+            lc, direction="+", method="sequential", iterations=5000, seed=3
+        )
+        self.assertListEqual(list(validated.keys()), lc.groups_ids())
+        analytic = validate_all_flows(lc, direction="+", method="analytic")
+
+        draws = list()
+        for target, flow in validated.items():
+            for name, null_model in flow.items():
+                self.assertEqual(null_model["iterations"] % 100, 0)  # whole batches
+                self.assertLessEqual(null_model["iterations"], 5000)
+                draws.append(null_model["iterations"])
+                if null_model["iterations"] < 5000:  # settled early: same decision
+                    self.assertEqual(
+                        null_model["p-value"] < 0.05,
+                        analytic[target][name]["p-value"] < 0.05,
+                    )
+        self.assertLess(np.mean(draws), 5000 / 2)
+
+        self.assertDictEqual(
+            validated,
+            validate_all_flows(
+                lc,
+                direction="+",
+                method="sequential",
+                iterations=5000,
+                seed=3,
+                n_jobs=2,
+            ),
+        )
+        self.assertDictEqual(
+            validate_flow(lc, "0_0", "+", method="sequential", iterations=5000, seed=3),
+            validated["0_0"],
+        )
+
+        strict = validate_all_flows(
+            lc, direction="+", method="sequential", iterations=5000, seed=3, alpha=0.001
+        )
+        self.assertNotEqual(strict, validated)
+
+    def test_null_model_cache(self):
+        cache = NullModelCache(maxsize=2)
+        for key in ["a", "b", "a", "c", "b"]:
+            self.assertEqual(
+                cache.get_or_compute(key, lambda: key.upper()), key.upper()
+            )
+        # "b" was evicted by "c", being the least recently used
+        self.assertDictEqual(
+            cache.info(), {"hits": 1, "misses": 4, "maxsize": 2, "currsize": 2}
+        )
+
+        data = self.get_data()
+        lc = LifeCycle(int)
+        lc.add_partitions_from(data)
+        flows = lc.all_flows("+", counts_only=True)
+        n_branches = sum(len(flow) for flow in flows.values())
+        distinct = {
+            (name.split("_")[0], size)
+            for flow in flows.values()
+            for size in flow.values()
+            for name in flow
+        }
+        for n_jobs in [1, 2]:
+            cache = NullModelCache(maxsize=None)
+            validate_all_flows(
+                lc, "+", iterations=10, method="montecarlo", cache=cache, n_jobs=n_jobs
+            )
+            self.assertEqual(cache.hits + cache.misses, n_branches)
+            if n_jobs == 1:
+                self.assertEqual(cache.misses, len(distinct))
+            else:  # each chunk of targets has its own cache
+                self.assertGreaterEqual(cache.misses, len(distinct))
+
+    def test_validate_all_flows_reproducible(self):
+        data = self.get_data()
+        lc = LifeCycle(int)
+        lc.add_partitions_from(data)
+        for method in ["empirical", "montecarlo"]:
+            validated = validate_all_flows(
+                lc, direction="+", iterations=20, method=method, seed=11
+            )
+            self.assertDictEqual(
+                validated,
+                validate_all_flows(
+                    lc, direction="+", iterations=20, method=method, seed=11, n_jobs=3
+                ),
+            )
+            self.assertDictEqual(
+                validated,
+                validate_all_flows(
+                    lc,
+                    direction="+",
+                    iterations=20,
+                    method=method,
+                    seed=11,
+                    cache=NullModelCache(maxsize=1),
+                ),
+            )
+            for target in ["0_0", "4_1"]:
+                self.assertDictEqual(
+                    validated[target],
+                    validate_flow(
+                        lc, target, "+", iterations=20, method=method, seed=11
+                    ),
+                )
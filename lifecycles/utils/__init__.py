@@ -1 +1,2 @@
+from lifecycles.utils.instrumentation import *
 from lifecycles.utils.utils import *
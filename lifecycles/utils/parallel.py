@@ -0,0 +1,86 @@
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+
+from lifecycles.classes.flows import FlowMatrix
+
+__all__ = ["map_tasks", "map_flows"]
+
+
+def _n_workers(n_jobs: int) -> int:
+    """
+    resolve the number of workers: None or 1 means serial execution, negative values count back from the number
+    of CPUs (-1 = all CPUs)
+    """
+    if n_jobs is None or n_jobs == 0:
+        return 1
+    if n_jobs < 0:
+        return max((os.cpu_count() or 1) + 1 + n_jobs, 1)
+    return n_jobs
+
+
+def map_tasks(func, tasks: list, n_jobs: int = 1, executor: Executor = None) -> list:
+    """
+    apply a function to a list of argument tuples, either serially or on a pool of workers.
+    Results are always returned in the order of the tasks.
+
+    :param func: a picklable (i.e., module-level) function
+    :param tasks: a list of tuples of arguments
+    :param n_jobs: the number of worker processes. 1 (default) runs the tasks in the current process, -1 uses all CPUs
+    :param executor: a concurrent.futures.Executor to run the tasks on. If provided, n_jobs is ignored
+    :return: the list of results
+    """
+    if len(tasks) == 0:
+        return []
+    if executor is not None:
+        return list(executor.map(func, *zip(*tasks)))
+
+    n_workers = min(_n_workers(n_jobs), len(tasks))
+    if n_workers == 1:
+        return [func(*task) for task in tasks]
+
+    chunksize = max(len(tasks) // (4 * n_workers), 1)
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        return list(pool.map(func, *zip(*tasks), chunksize=chunksize))
+
+
+def _flow_task(func, source, reference, *args):
+    return func(FlowMatrix.from_partitions(source, reference), *args)
+
+
+def map_flows(
+    lc: object,
+    func,
+    tids: list,
+    direction: str,
+    args: list = None,
+    n_jobs: int = 1,
+    executor: Executor = None,
+) -> list:
+    """
+    apply a function to the flow matrix of each of the given time steps, i.e., call func(flow_matrix, *args[i]) for
+    the i-th tid. Serial runs reuse the flow matrices cached by the LifeCycle; parallel runs ship each worker only the
+    two partitions of its time step, and the worker computes the flow matrix itself.
+
+    :param lc: a LifeCycle object
+    :param func: a picklable (i.e., module-level) function taking a FlowMatrix as first argument
+    :param tids: the temporal ids of the source partitions
+    :param direction: the temporal direction of the flows
+    :param args: a list of tuples of additional arguments, one per tid. Defaults to no additional arguments
+    :param n_jobs: the number of worker processes. 1 (default) runs in the current process, -1 uses all CPUs
+    :param executor: a concurrent.futures.Executor to run the tasks on. If provided, n_jobs is ignored
+    :return: the list of results, in the order of tids
+    """
+    if args is None:
+        args = [()] * len(tids)
+    if executor is None and _n_workers(n_jobs) == 1:
+        return [
+            func(lc.get_flow_matrix(tid, direction), *args_)
+            for tid, args_ in zip(tids, args)
+        ]
+
+    shift = 1 if direction == "+" else -1
+    tasks = [
+        (func, lc.get_partition_csr(tid), lc.get_partition_csr(tid + shift)) + args_
+        for tid, args_ in zip(tids, args)
+    ]
+    return map_tasks(_flow_task, tasks, n_jobs=n_jobs, executor=executor)
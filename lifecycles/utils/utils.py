@@ -73,9 +73,8 @@ def get_group_attribute_values(lc: object, target: str, attr_name: str) -> list:
     :return: a list of attributes corresponding to the elements in the set
     """
 
-    tid = int(target.split("_")[0])
-    attributes = list()
-
-    for elem in lc.get_group(target):
-        attributes.append(lc.get_attributes(attr_name, of=elem)[tid])
-    return attributes
+    codes = lc.get_group_attribute_codes(target, attr_name)
+    if (codes < 0).any():
+        raise KeyError(f"missing {attr_name} values for members of {target}")
+    categories = lc.get_attribute_categories(attr_name)
+    return [categories[code] for code in codes.tolist()]
@@ -1 +1,5 @@
-from lifecycles.validation.validation import validate_flow, validate_all_flows
+from lifecycles.validation.validation import (
+    validate_flow,
+    validate_all_flows,
+    NullModelCache,
+)
@@ -1,32 +1,109 @@
+import os
 import random
-from collections import Counter, defaultdict
+from collections import Counter, OrderedDict, defaultdict
 from statistics import mean, stdev
 
+import numpy as np
 import scipy.stats as stats
 
 from lifecycles.classes.classes import LifeCycle
+from lifecycles.utils.instrumentation import instrumented
+from lifecycles.utils.parallel import _n_workers, map_tasks
 
-__all__ = ["validate_flow", "validate_all_flows"]
+__all__ = ["validate_flow", "validate_all_flows", "NullModelCache"]
 
 
-def _generate_random_branch(reference, size):
+class NullModelCache(object):
+    """
+    A least recently used (LRU) cache of sampled null models.
+    All the branches drawn from the same reference partition with the same size share the same null model, which is
+    computed once and kept until *maxsize* more recently used null models are stored.
+    The number of hits and misses is tracked to help sizing the cache.
+
+    :param maxsize: the maximum number of null models to keep. If None, the cache is unbounded
+
+    :Example:
+
+    >>> import lifecycles as lcs
+    >>> # ... create a lc object here ...
+    >>> cache = lcs.NullModelCache(maxsize=256)
+    >>> validated = lcs.validate_all_flows(lc, "+", cache=cache)
+    >>> cache.info()
+    >>> # {'hits': 812, 'misses': 190, 'maxsize': 256, 'currsize': 34}
+    """
+
+    def __init__(self, maxsize: int = 128) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._models = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._models)
+
+    def get_or_compute(self, key: tuple, compute) -> dict:
+        """
+        retrieve a null model, computing and storing it if missing
+
+        :param key: the key of the null model
+        :param compute: a function with no arguments computing the null model
+        :return: the null model
+        """
+        if key in self._models:
+            self.hits += 1
+            self._models.move_to_end(key)
+            return self._models[key]
+
+        self.misses += 1
+        model = compute()
+        self._models[key] = model
+        if self.maxsize is not None and len(self._models) > self.maxsize:
+            self._models.popitem(last=False)
+        return model
+
+    def info(self) -> dict:
+        """
+        retrieve the statistics of the cache
+
+        :return: a dictionary with the number of hits and misses, the maximum size and the current size
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "maxsize": self.maxsize,
+            "currsize": len(self._models),
+        }
+
+    def clear(self) -> None:
+        """
+        discard all the null models and reset the statistics
+        """
+        self._models.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+def _generate_random_branch(reference, size, rng=random):
     """
     Generate a random branch of a given size by sampling elements from the reference partition.
     """
     elems = list()
     for subset in reference:
         elems.extend(subset)
-    return random.sample(elems, size)
+    return rng.sample(elems, size)
 
 
-def _null_model(branch, reference, iterations):
+@instrumented(
+    "_null_model", lambda res, size, reference, iterations, *a, **k: iterations
+)
+def _null_model(size, reference, iterations, rng=random):
     """
-    Generate a null model for a given branch by generating num_permutations random branches of the same size and
-    computing the mean and standard deviation of the frequency of each element in the reference partition.
+    Generate a null model for a branch of a given size by generating num_permutations random branches of the same
+    size and computing the mean and standard deviation of the frequency of each element in the reference partition.
     """
     null_branch = defaultdict(list)
     for _ in range(iterations):
-        random_branch = _generate_random_branch(reference, len(branch))
+        random_branch = _generate_random_branch(reference, size, rng)
         count = Counter(random_branch)
         for name, frequency in count.items():
             null_branch[name].append(frequency)
@@ -56,28 +133,389 @@ def _p_value(size, null_model):
     return p
 
 
+@instrumented(
+    "_montecarlo_null_model",
+    lambda res, size, reference_sizes, iterations, *a, **k: iterations,
+)
+def _montecarlo_null_model(size, reference_sizes, iterations, rng):
+    """
+    Generate a null model for a branch of a given size by drawing all the *iterations* random branches at once from a
+    multivariate hypergeometric distribution: each row of the draws holds the number of members of each reference
+    group in a random branch. Return the mean and standard deviation of each reference group (column).
+    """
+    draws = rng.multivariate_hypergeometric(reference_sizes, size, size=iterations)
+    if iterations < 2:
+        return draws.mean(axis=0), np.zeros(len(reference_sizes))
+    return draws.mean(axis=0), draws.std(axis=0, ddof=1)
+
+
+def _clopper_pearson(successes, trials, confidence):
+    """
+    Exact (Clopper-Pearson) confidence interval of a binomial proportion, for arrays of successes out of *trials*.
+    """
+    q = (1 - confidence) / 2
+    # the bounds are 0 without successes and 1 without failures: keep the beta parameters positive
+    lower = stats.beta.ppf(q, np.maximum(successes, 1), trials - successes + 1)
+    upper = stats.beta.ppf(1 - q, successes + 1, np.maximum(trials - successes, 1))
+    lower = np.where(successes > 0, lower, 0.0)
+    upper = np.where(successes < trials, upper, 1.0)
+    return lower, upper
+
+
+class _SequentialNullModel(object):
+    """
+    Sequential Monte Carlo null model of the branches of a given size. Random branches are drawn in batches from a
+    multivariate hypergeometric distribution; the p-value of a reference group is the fraction of draws in which at
+    least as many of the size elements fall in the group as in the observed branch, i.e., all of them. The observed
+    branch is never below the mean of the null model, so the test is one-sided. A group is settled as soon as the
+    Clopper-Pearson interval of its p-value lies entirely below or above alpha, or after max_iterations draws.
+    Draws are shared by all the reference groups, and each group is settled at the first batch deciding it, so the
+    result of a group does not depend on which branches were validated before it.
+    """
+
+    def __init__(
+        self,
+        size,
+        reference_sizes,
+        max_iterations,
+        alpha,
+        rng,
+        batch_size=100,
+        confidence=0.99,
+    ):
+        self.size = size
+        self.max_iterations = max(max_iterations, 1)
+        self.alpha = alpha
+        self.rng = rng
+        self.batch_size = batch_size
+        self.confidence = confidence
+        self._columns = {name: i for i, name in enumerate(reference_sizes)}
+        self._sizes = np.fromiter(reference_sizes.values(), dtype=np.int64)
+        self._draws = 0
+        self._sums = np.zeros(len(self._sizes))
+        self._squares = np.zeros(len(self._sizes))
+        self._extremes = np.zeros(len(self._sizes), dtype=np.int64)
+        self._pending = np.ones(len(self._sizes), dtype=bool)
+        self._settled = dict()
+
+    def _draw_batch(self):
+        n = min(self.batch_size, self.max_iterations - self._draws)
+        draws = self.rng.multivariate_hypergeometric(self._sizes, self.size, size=n)
+        self._draws += n
+        self._sums += draws.sum(axis=0)
+        self._squares += np.square(draws, dtype=np.float64).sum(axis=0)
+        self._extremes += (draws >= self.size).sum(axis=0)
+
+        if self._draws >= self.max_iterations:
+            settled = self._pending
+        else:
+            lower, upper = _clopper_pearson(
+                self._extremes, self._draws, self.confidence
+            )
+            settled = self._pending & ((upper < self.alpha) | (lower > self.alpha))
+        cols = np.flatnonzero(settled)
+        means = self._sums[cols] / self._draws
+        stds = np.zeros(len(cols))
+        if self._draws > 1:
+            stds = np.sqrt(
+                np.maximum(
+                    (self._squares[cols] - self._draws * means**2) / (self._draws - 1),
+                    0,
+                )
+            )
+        p = self._extremes[cols] / self._draws
+        for col, m, s, p_ in zip(
+            cols.tolist(), means.tolist(), stds.tolist(), p.tolist()
+        ):
+            self._settled[col] = {
+                "mean": m,
+                "std": s,
+                "p-value": p_,
+                "iterations": self._draws,
+            }
+        self._pending = self._pending & ~settled
+
+    def get(self, name) -> dict:
+        """
+        draw random branches until the given reference group is settled, and return its null model
+        """
+        col = self._columns[name]
+        while col not in self._settled:
+            self._draw_batch()
+        return dict(self._settled[col])
+
+
+@instrumented("_hypergeom_null_model", lambda res, sizes, *a, **k: len(sizes))
+def _hypergeom_null_model(sizes, reference_sizes, total):
+    """
+    Closed-form null model: the number of members of a reference group found among *size* elements drawn without
+    replacement from the reference partition follows a hypergeometric distribution.
+    Return the mean, the standard deviation and the p-value of each branch, i.e., the probability that all the *size*
+    elements fall in the reference group, as in the observed branch. The observed branch is never below the mean, so
+    the test is one-sided.
+    """
+    sizes = np.asarray(sizes, dtype=np.int64)
+    reference_sizes = np.asarray(reference_sizes, dtype=np.int64)
+    mean = sizes * reference_sizes / max(total, 1)
+    variance = np.zeros(len(sizes))
+    if total > 1:
+        variance = (
+            mean * (total - reference_sizes) / total * (total - sizes) / (total - 1)
+        )
+    std = np.sqrt(np.maximum(variance, 0))
+    p = stats.hypergeom.sf(sizes - 1, total, reference_sizes, sizes)
+    return mean, std, p
+
+
+def _seed_sequence(seed) -> np.random.SeedSequence:
+    """
+    Convert a seed (None, an int, a SeedSequence or a Generator) to the root SeedSequence of the random streams.
+    """
+    if isinstance(seed, np.random.SeedSequence):
+        return seed
+    if isinstance(seed, np.random.Generator):
+        seed = int(seed.integers(2**63 - 1))
+    return np.random.SeedSequence(seed)
+
+
+def _stream(root: np.random.SeedSequence, ref_tid: int, size: int):
+    """
+    The random stream of the null models of the branches of a given size drawn from the partition observed at
+    ref_tid. Streams only depend on the root seed and on their key, so they do not depend on how targets are split
+    across workers, nor on the order in which they are validated.
+    """
+    # spawn keys must be non-negative: shift the tid, which is -1 before the first partition
+    return np.random.SeedSequence(
+        root.entropy, spawn_key=tuple(root.spawn_key) + (ref_tid + 1, size)
+    )
+
+
+def _sampled_null_model(size, reference_sizes, iterations, method, stream, alpha=0.05):
+    """
+    Generate the null model of a branch of a given size by sampling, as a dictionary keyed by the names of the
+    reference groups and valued by mean and standard deviation (a _SequentialNullModel for the sequential method).
+    """
+    if method == "sequential":
+        return _SequentialNullModel(
+            size, reference_sizes, iterations, alpha, np.random.default_rng(stream)
+        )
+    if method == "empirical":
+        state = stream.generate_state(2, np.uint64).tolist()
+        # convert to list of ids lists
+        reference = [[name] * size_ for name, size_ in reference_sizes.items()]
+        return _null_model(
+            size, reference, iterations, random.Random(state[0] << 64 | state[1])
+        )
+
+    sizes = np.fromiter(reference_sizes.values(), dtype=np.int64)
+    means, stds = _montecarlo_null_model(
+        size, sizes, iterations, np.random.default_rng(stream)
+    )
+    return {
+        name: {"mean": m, "std": s}
+        for name, m, s in zip(reference_sizes, means.tolist(), stds.tolist())
+    }
+
+
+@instrumented("_validate_flow", lambda res, *a, **k: len(res))
+def _validate_flow(
+    flow_counts,
+    reference_sizes,
+    iterations,
+    method="empirical",
+    root=None,
+    ref_tid=0,
+    cache=None,
+    alpha=0.05,
+):
+    """
+    Compare each branch of a flow, given as a dictionary of branch sizes, with its null model.
+    reference_sizes is a dictionary keyed by the names of the reference groups (observed at ref_tid) and valued by
+    their sizes. Sampled null models are shared by all the branches of the same size, through the cache.
+    """
+    validated = dict()
+    if method == "analytic":
+        names = list(flow_counts)
+        mean, std, p = _hypergeom_null_model(
+            [flow_counts[name] for name in names],
+            [reference_sizes[name] for name in names],
+            sum(reference_sizes.values()),
+        )
+        for name, m, s, p_ in zip(names, mean.tolist(), std.tolist(), p.tolist()):
+            validated[name] = {"mean": m, "std": s, "p-value": p_}
+        return validated
+
+    root = _seed_sequence(None) if root is None else root
+    cache = NullModelCache() if cache is None else cache
+    reference_key = (
+        method,
+        iterations,
+        root.entropy,
+        tuple(root.spawn_key),
+        ref_tid,
+        alpha if method == "sequential" else None,
+        hash(tuple(reference_sizes.items())),
+    )
+    for name, size in flow_counts.items():
+        null_models = cache.get_or_compute(
+            (reference_key, size),
+            lambda: _sampled_null_model(
+                size,
+                reference_sizes,
+                iterations,
+                method,
+                _stream(root, ref_tid, size),
+                alpha,
+            ),
+        )
+        if method == "sequential":
+            validated[name] = null_models.get(name)
+            continue
+        # a group never drawn in the random branches has a null frequency of 0
+        null_model = null_models.get(name, {"mean": 0, "std": 0})
+        # mull mean, null std, p-value
+        validated[name] = {
+            "mean": null_model["mean"],
+            "std": null_model["std"],
+            "p-value": _p_value(size, null_model),
+        }
+    return validated
+
+
+def _flow_counts(flow_matrix, min_branch_size) -> list:
+    """
+    Convert the rows of a flow matrix to dictionaries keyed by the names of the reference groups and valued by the
+    branch sizes.
+    """
+    names = flow_matrix.reference.names()
+    flows = list()
+    for row in range(len(flow_matrix.source)):
+        cols, counts = flow_matrix.row(row)
+        if min_branch_size < 1:  # empty branches are part of the flow too
+            flow_counts = dict.fromkeys(names, 0)
+            flow_counts.update(zip([names[c] for c in cols], counts.tolist()))
+        else:
+            keep = counts >= min_branch_size
+            flow_counts = dict(
+                zip([names[c] for c in cols[keep]], counts[keep].tolist())
+            )
+        flows.append(flow_counts)
+    return flows
+
+
+def _validate_flows(
+    flows, reference_sizes, ref_tid, iterations, method, root, cache, alpha=0.05
+):
+    """
+    Validate a list of flows towards the same reference partition.
+    Return the validated flows and the cache of null models used.
+    """
+    if method != "analytic":
+        validated = [
+            _validate_flow(
+                flow_counts,
+                reference_sizes,
+                iterations,
+                method,
+                root,
+                ref_tid,
+                cache,
+                alpha,
+            )
+            for flow_counts in flows
+        ]
+        return validated, cache
+
+    # all the branches at once
+    branches = [
+        (name, size) for flow_counts in flows for name, size in flow_counts.items()
+    ]
+    mean, std, p = _hypergeom_null_model(
+        [size for _, size in branches],
+        [reference_sizes[name] for name, _ in branches],
+        sum(reference_sizes.values()),
+    )
+    values = iter(zip(mean.tolist(), std.tolist(), p.tolist()))
+    validated = list()
+    for flow_counts in flows:
+        validated.append(
+            {
+                name: dict(zip(["mean", "std", "p-value"], next(values)))
+                for name in flow_counts
+            }
+        )
+    return validated, cache
+
+
+def _check_method(method: str) -> None:
+    if method not in ["empirical", "montecarlo", "sequential", "analytic"]:
+        raise ValueError(
+            "method must be one of 'empirical', 'montecarlo', 'sequential' or 'analytic'"
+        )
+
+
+@instrumented("validate_flow", lambda res, *a, **k: len(res))
 def validate_flow(
     lc: LifeCycle,
     target: str,
     direction: str,
     min_branch_size: int = 1,
     iterations: int = 1000,
+    method: str = "empirical",
+    seed=None,
+    cache: NullModelCache = None,
+    alpha: float = 0.05,
 ) -> dict:
     """
     Compare the flow with a null model. Each branch of each flow is compared with a null branch of the same size.
     The null model is generated by randomly sampling elements from the reference partition *iterations* times.
     The mean and standard deviation of the null model are used to compute a z-score
     for each branch, which is then used to compute a p-value.
+    With method="montecarlo", all the random branches are drawn at once from a multivariate hypergeometric
+    distribution over the sizes of the reference groups, which is much faster; note that, unlike the empirical method,
+    means and standard deviations also account for the draws in which a reference group does not appear.
+    With method="sequential", random branches are drawn in batches of 100 in the same way, and the draws stop as soon
+    as the 99% Clopper-Pearson confidence interval of the p-value lies entirely below or above alpha, with at most
+    *iterations* draws. The number of draws used by each branch is reported under "iterations". Branches far from the
+    significance threshold are thus settled after a few hundred draws.
+    With method="analytic", the null model is computed in closed form instead: the size of a null branch follows a
+    hypergeometric distribution, whose exact mean, standard deviation and tail probability are returned.
+    Note that the methods do not return the same kind of p-value: the empirical and montecarlo methods return the
+    normal tail probability of the z-score of the branch size, while the sequential and analytic methods return the
+    exact probability that a null branch is at least as large as the observed one (estimated from the random branches,
+    or in closed form). The null distribution of small branches is far from normal, so the two kinds of p-values can
+    differ widely (e.g., 0.015 vs 0.14) and a branch may be significant for one kind only: do not compare p-values
+    obtained with different kinds of methods.
+    Sampling methods are reproducible given a seed: the null models of the branches of a given size drawn from a given
+    reference partition use their own random stream, derived from the seed with numpy's SeedSequence.
 
     :param lc: a LifeCycle object
     :param target: target set identifier
     :param direction: temporal direction
     :param min_branch_size: minimum size of a branch to be considered
-    :param iterations: number of random draws to be used to generate the null model
-    :return:
+    :param iterations: number of random draws to be used to generate the null model (sampling methods only). For the
+        sequential method, the maximum number of draws
+    :param method: one of "empirical" (default), which samples random branches one by one, "montecarlo",
+        "sequential", or "analytic"
+    :param seed: the seed of the random draws: an int, a numpy SeedSequence or a numpy Generator. If None, fresh
+        entropy is used
+    :param cache: a NullModelCache storing the sampled null models, which are shared by all the branches drawn from
+        the same reference partition with the same size. If None, a new cache is used
+    :param alpha: the significance level at which the sequential method stops drawing (sequential method only)
+    :return: a dictionary keyed by branch identifier and valued by mean, std, and p-value (and iterations, for the
+        sequential method)
+
+    :Example:
+
+    >>> import lifecycles as lcs
+    >>> # ... create a lc object here ...
+    >>> validated = lcs.validate_flow(lc, "0_0", "+", method="analytic")
+    >>> validated = lcs.validate_flow(lc, "0_0", "+", method="montecarlo", seed=42)
+    >>> validated = lcs.validate_flow(lc, "0_0", "+", method="sequential", alpha=0.01, iterations=10000)
     """
+    _check_method(method)
 
-    flow = lc.group_flow(target, direction, min_branch_size)
+    flow = lc.group_flow(target, direction, min_branch_size, counts_only=True)
     tid = int(target.split("_")[0])
     if direction == "+":
         tid += 1
@@ -85,39 +523,110 @@ def validate_flow(
         tid -= 1
     else:
         raise ValueError(f"Invalid direction: {direction}")
-    # convert to list of ids lists
-    reference = [[id_] * len(lc.get_group(id_)) for id_ in lc.get_partition_at(tid)]
+    reference_sizes = {id_: len(lc.get_group(id_)) for id_ in lc.get_partition_at(tid)}
 
-    validated = dict()
-    for name, subset in flow.items():
-        null_model = _null_model(subset, reference, iterations)[name]
-        # mull mean, null std, p-value
-        validated[name] = {
-            "mean": null_model["mean"],
-            "std": null_model["std"],
-            "p-value": _p_value(len(subset), null_model),
-        }
-    return validated
+    return _validate_flow(
+        flow,
+        reference_sizes,
+        iterations,
+        method,
+        _seed_sequence(seed),
+        tid,
+        cache,
+        alpha,
+    )
+
+
+def _chunk_size(n_targets: int, n_jobs: int, executor) -> int:
+    """
+    The number of targets per task when running in parallel: about four tasks per worker.
+    """
+    n_workers = _n_workers(n_jobs) if executor is None else os.cpu_count() or 1
+    return max(-(-n_targets // (4 * n_workers)), 1)
 
 
+@instrumented("validate_all_flows", lambda res, *a, **k: len(res))
 def validate_all_flows(
     lc: LifeCycle,
     direction: str,
     min_branch_size=1,
     iterations=1000,
+    method: str = "empirical",
+    seed=None,
+    cache: NullModelCache = None,
+    alpha: float = 0.05,
+    n_jobs: int = 1,
+    executor=None,
 ):
     """
     Compare all flows with null models. See validate_flow for details.
+    Targets are independent of each other, so they can be validated in parallel: they are split in chunks of targets
+    observed at the same time, and each worker receives only the flows of its chunk and the sizes of the reference
+    groups. Since each null model draws from its own random stream, results are identical for any number of workers.
 
     :param lc: a LifeCycle object
     :param direction: temporal direction
     :param min_branch_size: minimum size of a branch to be considered
-    :param iterations: number of random draws to be used to generate the null model
+    :param iterations: number of random draws to be used to generate the null model (sampling methods only). For the
+        sequential method, the maximum number of draws
+    :param method: one of "empirical" (default), "montecarlo", "sequential", or "analytic", which computes the null
+        model of all the branches of a time step in closed form. The empirical and montecarlo methods return z-score
+        based p-values, while the sequential and analytic methods return exact tail probabilities, which may differ
+        widely: see validate_flow
+    :param seed: the seed of the random draws: an int, a numpy SeedSequence or a numpy Generator. If None, fresh
+        entropy is used
+    :param cache: a NullModelCache storing the sampled null models. All the targets of a time step share the same
+        reference partition, so each distinct null model is computed once per time step. When running on several
+        workers, each chunk of targets uses a private cache of the same maxsize, whose hits and misses are added to
+        this one. If None, a new cache is used
+    :param alpha: the significance level at which the sequential method stops drawing (sequential method only)
+    :param n_jobs: the number of worker processes. 1 (default) runs in the current process, -1 uses all CPUs
+    :param executor: a concurrent.futures.Executor to run the chunks of targets on. If provided, n_jobs is ignored
     :return: a dictionary keyed by set identifier and valued by mean, std, and p-value
+
+    :Example:
+
+    >>> import lifecycles as lcs
+    >>> # ... create a lc object here ...
+    >>> validated = lcs.validate_all_flows(lc, "+", method="montecarlo", seed=42, n_jobs=4)
     """
-    validated = dict()
-    for target, flow in lc.all_flows(direction, min_branch_size).items():
-        validated[target] = validate_flow(
-            lc, target, direction, min_branch_size, iterations
+    if direction not in ["+", "-"]:
+        raise ValueError(f"Invalid direction: {direction}")
+    _check_method(method)
+    root = _seed_sequence(seed)
+    cache = NullModelCache() if cache is None else cache
+    serial = executor is None and _n_workers(n_jobs) == 1
+    shift = 1 if direction == "+" else -1
+    chunk_size = _chunk_size(len(lc.groups_ids()), n_jobs, executor)
+
+    names, tasks = list(), list()
+    for tid in lc.temporal_ids():
+        flow_matrix = lc.get_flow_matrix(tid, direction)
+        reference_sizes = dict(
+            zip(flow_matrix.reference.names(), flow_matrix.reference.sizes().tolist())
         )
-    return validated
+        flows = _flow_counts(flow_matrix, min_branch_size)
+        names.extend(flow_matrix.source.names())
+        chunk = max(len(flows), 1) if serial else chunk_size
+        for start in range(0, len(flows), chunk):
+            tasks.append(
+                (
+                    flows[start : start + chunk],
+                    reference_sizes,
+                    tid + shift,
+                    iterations,
+                    method,
+                    root,
+                    cache if serial else NullModelCache(cache.maxsize),
+                    alpha,
+                )
+            )
+    results = map_tasks(_validate_flows, tasks, n_jobs=n_jobs, executor=executor)
+
+    validated = list()
+    for flows, task_cache in results:
+        validated.extend(flows)
+        if task_cache is not cache:
+            cache.hits += task_cache.hits
+            cache.misses += task_cache.misses
+    return dict(zip(names, validated))
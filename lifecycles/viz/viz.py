@@ -178,13 +178,15 @@ def plot_flow(lc, node_focus=None, slice=None):
     all_flows = lc.all_flows("+")
     sum_out = 0
     group_size = {}
+    focus_groups = set()
+    if node_focus is not None:
+        focus_groups = set(lc.get_element_membership(node_focus))
     for name, flow in all_flows.items():
         nodes_group1 = lc.get_group(name)
         group_size[name] = len(nodes_group1)
         for name2, common in flow.items():
             if node_focus is not None:
-                nodes_group2 = lc.get_group(name2)
-                if node_focus not in nodes_group2 | nodes_group1:
+                if name not in focus_groups and name2 not in focus_groups:
                     continue
             link = (name, name2, len(common))
             links.append(link)
@@ -230,9 +232,7 @@ def plot_flow(lc, node_focus=None, slice=None):
 
     groups_containing_node = None
     if node_focus is not None:
-        groups_containing_node = [
-            name for name in all_flows.keys() if node_focus in lc.get_group(name)
-        ]
+        groups_containing_node = lc.get_element_membership(node_focus)
 
     # print(links)
     _make_sankey(